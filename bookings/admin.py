@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Booking, BookingPayment, BookingReview, FavoriteCar
+from .models import Booking, BookingPayment, BookingReview, FavoriteCar, OutgoingEmail, CarRecommendation
 
 @admin.register(Booking)
 class BookingAdmin(admin.ModelAdmin):
@@ -32,4 +32,18 @@ class FavoriteCarAdmin(admin.ModelAdmin):
     list_filter = ('created_at',)
     search_fields = ('customer__username', 'car__make', 'car__model')
     readonly_fields = ('created_at',)
-    raw_id_fields = ('customer', 'car')
\ No newline at end of file
+    raw_id_fields = ('customer', 'car')
+
+@admin.register(OutgoingEmail)
+class OutgoingEmailAdmin(admin.ModelAdmin):
+    list_display = ('subject', 'status', 'attempts', 'next_attempt_at', 'sent_at', 'created_at')
+    list_filter = ('status', 'created_at')
+    search_fields = ('subject', 'recipients')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+
+@admin.register(CarRecommendation)
+class CarRecommendationAdmin(admin.ModelAdmin):
+    list_display = ('customer', 'car_type', 'rank', 'car', 'score')
+    list_filter = ('car_type',)
+    search_fields = ('customer__username',)
+    raw_id_fields = ('customer', 'car')
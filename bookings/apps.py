@@ -5,6 +5,5 @@ class BookingsConfig(AppConfig):
     name = 'bookings'
     
     def ready(self):
-        # We'll add signals back when we have Celery installed
-        # import bookings.signals
-        pass
\ No newline at end of file
+        # Emails go through the OutgoingEmail outbox, so signals never block on SMTP
+        import bookings.signals
@@ -0,0 +1,129 @@
+from collections import Counter, defaultdict
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from bookings.models import Booking, CarRecommendation, FavoriteCar
+from rentals.models import Car
+import heapq
+import logging
+import math
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Rebuild CarRecommendation with an item-item recommender over bookings and favorites'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=20, help='Cars stored per customer and per car type')
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        if top_k < 1:
+            raise CommandError('--top-k must be at least 1')
+        started = time.monotonic()
+
+        cars = {
+            car_id: (car_type, avg_rating)
+            for car_id, car_type, avg_rating in Car.objects.filter(is_active=True).values_list('id', 'car_type', 'avg_rating')
+        }
+
+        # Binary customer x car interaction matrix, stored sparse as one set per customer
+        interactions = defaultdict(set)
+        booked = defaultdict(set)
+        for customer_id, car_id in Booking.objects.exclude(status='cancelled').values_list('customer_id', 'car_id').iterator():
+            if car_id in cars:
+                interactions[customer_id].add(car_id)
+                booked[customer_id].add(car_id)
+        for customer_id, car_id in FavoriteCar.objects.values_list('customer_id', 'car_id').iterator():
+            if car_id in cars:
+                interactions[customer_id].add(car_id)
+
+        similar = self.item_similarities(interactions.values())
+        popular = self.popularity(cars, interactions.values(), top_k)
+
+        rows = []
+        for car_type, ranked in popular.items():
+            rows.extend(
+                CarRecommendation(car_type=car_type, car_id=car_id, rank=rank, score=score)
+                for rank, (car_id, score) in enumerate(ranked, start=1)
+            )
+        for customer_id, items in interactions.items():
+            ranked = self.recommend(items, booked[customer_id], similar, popular, cars, top_k)
+            rows.extend(
+                CarRecommendation(customer_id=customer_id, car_id=car_id, rank=rank, score=score)
+                for rank, (car_id, score) in enumerate(ranked, start=1)
+            )
+
+        with transaction.atomic():
+            CarRecommendation.objects.all().delete()
+            CarRecommendation.objects.bulk_create(rows, batch_size=1000)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Successfully stored {len(rows)} recommendations for {len(interactions)} customers '
+                f'and {len(popular)} popularity lists in {elapsed:.2f}s.'
+            )
+        )
+        logger.info(f"Recommendations rebuilt: {len(rows)} rows in {elapsed:.2f}s")
+
+    def item_similarities(self, baskets):
+        """Cosine similarity between cars from their co-occurrence counts.
+
+        Only pairs that share at least one customer are ever visited, so the
+        cost follows the number of interactions rather than the fleet size squared.
+        """
+        item_counts = Counter()
+        co_counts = defaultdict(Counter)
+        for items in baskets:
+            item_counts.update(items)
+            for car_id in items:
+                for other_id in items:
+                    if other_id != car_id:
+                        co_counts[car_id][other_id] += 1
+
+        return {
+            car_id: {
+                other_id: count / math.sqrt(item_counts[car_id] * item_counts[other_id])
+                for other_id, count in others.items()
+            }
+            for car_id, others in co_counts.items()
+        }
+
+    def popularity(self, cars, baskets, top_k):
+        """Top-K cars per car type and fleet wide (key ''), by interactions plus stored rating"""
+        item_counts = Counter()
+        for items in baskets:
+            item_counts.update(items)
+
+        by_type = defaultdict(list)
+        for car_id, (car_type, avg_rating) in cars.items():
+            # The rating lets well reviewed cars without history still rank
+            score = item_counts[car_id] + avg_rating
+            by_type[car_type].append((car_id, score))
+            by_type[''].append((car_id, score))
+
+        return {
+            car_type: heapq.nlargest(top_k, scored, key=lambda item: (item[1], -item[0]))
+            for car_type, scored in by_type.items()
+        }
+
+    def recommend(self, items, booked, similar, popular, cars, top_k):
+        """Score unbooked cars by summed similarity, then fill from the customer's favorite type and the fleet"""
+        scores = Counter()
+        for car_id in items:
+            for other_id, similarity in similar.get(car_id, {}).items():
+                if other_id not in booked:
+                    scores[other_id] += similarity
+        ranked = heapq.nlargest(top_k, scores.items(), key=lambda item: (item[1], -item[0]))
+
+        favorite_type = Counter(cars[car_id][0] for car_id in items).most_common(1)[0][0]
+        seen = set(booked) | {car_id for car_id, _ in ranked}
+        for car_id, _ in popular.get(favorite_type, []) + popular.get('', []):
+            if len(ranked) >= top_k:
+                break
+            if car_id not in seen:
+                seen.add(car_id)
+                # Fallback entries rank below every collaborative match
+                ranked.append((car_id, 0.0))
+        return ranked
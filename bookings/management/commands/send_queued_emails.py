@@ -0,0 +1,104 @@
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.db import connection as db_connection, transaction
+from django.utils import timezone
+from datetime import timedelta
+from bookings.models import OutgoingEmail
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Deliver queued emails from the outbox in batches over one reused SMTP connection'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty')
+        parser.add_argument('--interval', type=float, default=5.0, help='Seconds to wait between polls in --loop mode')
+        parser.add_argument('--max-attempts', type=int, default=6, help='Give up on a message after this many failures')
+        parser.add_argument('--lease', type=int, default=300, help='Seconds a claimed batch is hidden from other workers')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            batch = self.claim_batch(options['batch_size'], options['lease'])
+            if batch:
+                sent, failed = self.deliver(batch, options['max_attempts'])
+                total_sent += sent
+                total_failed += failed
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(f'Sent {total_sent} emails, {total_failed} failed attempts.'))
+
+    def claim_batch(self, batch_size, lease):
+        """Lease due messages by pushing their next attempt into the future.
+
+        A worker that dies mid-batch leaves its messages pending; they become
+        due again when the lease runs out.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            due = OutgoingEmail.objects.filter(status='pending', next_attempt_at__lte=now).order_by('next_attempt_at', 'id')
+            if db_connection.features.has_select_for_update_skip_locked:
+                due = due.select_for_update(skip_locked=True)
+            batch = list(due[:batch_size])
+            if batch:
+                OutgoingEmail.objects.filter(pk__in=[email.pk for email in batch]).update(
+                    next_attempt_at=now + timedelta(seconds=lease)
+                )
+        return batch
+
+    def deliver(self, batch, max_attempts):
+        sent = failed = 0
+        mail_connection = get_connection(fail_silently=False)
+        try:
+            mail_connection.open()
+            for email in batch:
+                message = EmailMultiAlternatives(
+                    subject=email.subject,
+                    body=email.body,
+                    from_email=email.from_email,
+                    to=email.recipients,
+                    connection=mail_connection,
+                )
+                if email.html_body:
+                    message.attach_alternative(email.html_body, 'text/html')
+                try:
+                    mail_connection.send_messages([message])
+                except Exception as e:
+                    self.record_failure(email, e, max_attempts)
+                    failed += 1
+                else:
+                    OutgoingEmail.objects.filter(pk=email.pk).update(
+                        status='sent', sent_at=timezone.now(), attempts=email.attempts + 1, last_error=''
+                    )
+                    sent += 1
+        except Exception as e:
+            # Could not connect at all; every unsent message in the batch counts as a failed attempt
+            for email in batch[sent + failed:]:
+                self.record_failure(email, e, max_attempts)
+                failed += 1
+        finally:
+            mail_connection.close()
+
+        logger.info(f"Email outbox: {sent} sent, {failed} failed")
+        return sent, failed
+
+    def record_failure(self, email, error, max_attempts):
+        attempts = email.attempts + 1
+        if attempts >= max_attempts:
+            status = 'failed'
+            next_attempt_at = timezone.now()
+            logger.error(f"Giving up on email #{email.pk} after {attempts} attempts: {str(error)}")
+        else:
+            status = 'pending'
+            # 1, 2, 4, 8 ... minutes, capped at an hour
+            next_attempt_at = timezone.now() + timedelta(minutes=min(60, 2 ** (attempts - 1)))
+            logger.warning(f"Email #{email.pk} failed (attempt {attempts}), retrying at {next_attempt_at}: {str(error)}")
+        OutgoingEmail.objects.filter(pk=email.pk).update(
+            status=status, attempts=attempts, next_attempt_at=next_attempt_at, last_error=str(error)
+        )
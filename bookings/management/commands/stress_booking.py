@@ -0,0 +1,91 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.utils import timezone
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from bookings.models import Booking
+from bookings.services import BookingService, CarUnavailableError
+from rentals.models import Car
+from users.models import User, CarOwner
+import logging
+import random
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Fire concurrent bookings at a single throwaway car and check that none overlap'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=16)
+        parser.add_argument('--bookings', type=int, default=400, help='Total booking attempts')
+        parser.add_argument('--days', type=int, default=120, help='Date window the attempts are spread over')
+        parser.add_argument('--keep', action='store_true', help='Keep the generated car, users and bookings')
+
+    def handle(self, *args, **options):
+        tag = uuid.uuid4().hex[:8]
+        owner_user = User.objects.create_user(f'stress-owner-{tag}', f'stress-owner-{tag}@example.com', uuid.uuid4().hex)
+        customer = User.objects.create_user(f'stress-customer-{tag}', f'stress-customer-{tag}@example.com', uuid.uuid4().hex)
+        car = Car.objects.create(
+            owner=CarOwner.objects.create(user=owner_user),
+            make='Stress', model='Test', year=timezone.now().year, car_type='sedan',
+            daily_rate=10, license_plate=f'STRESS-{tag}', pickup_location='Depot', city='Test',
+            image='car_images/stress-test.png',
+        )
+
+        first_day = timezone.now().date() + timedelta(days=1)
+        attempts = []
+        for _ in range(options['bookings']):
+            start = first_day + timedelta(days=random.randrange(options['days']))
+            attempts.append((start, start + timedelta(days=random.randint(1, 7))))
+
+        def attempt(dates):
+            start_date, end_date = dates
+            booking = Booking(
+                customer_id=customer.id, car_id=car.id, start_date=start_date, end_date=end_date,
+                total_days=(end_date - start_date).days, total_amount=0, pickup_location='Depot',
+            )
+            try:
+                BookingService.reserve(booking)
+                return 'created'
+            except CarUnavailableError:
+                return 'conflict'
+            except Exception as e:
+                logger.error(f"Stress booking failed: {str(e)}")
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=options['threads']) as executor:
+            outcomes = list(executor.map(attempt, attempts))
+        elapsed = time.monotonic() - started
+
+        intervals = sorted(
+            Booking.objects.filter(car=car, status__in=['pending', 'confirmed', 'active'])
+            .values_list('start_date', 'end_date')
+        )
+        overlaps = 0
+        latest_end = None
+        for start_date, end_date in intervals:
+            if latest_end and start_date < latest_end:
+                overlaps += 1
+            latest_end = max(latest_end, end_date) if latest_end else end_date
+
+        self.stdout.write(
+            f"{len(attempts)} attempts on {options['threads']} threads in {elapsed:.2f}s "
+            f"({len(attempts) / elapsed:.0f}/s): {outcomes.count('created')} created, "
+            f"{outcomes.count('conflict')} rejected, {outcomes.count('error')} errors"
+        )
+
+        if not options['keep']:
+            car.delete()
+            customer.delete()
+            owner_user.delete()
+
+        if overlaps:
+            raise CommandError(f'{overlaps} overlapping bookings found')
+        if outcomes.count('error'):
+            raise CommandError(f"{outcomes.count('error')} booking attempts failed")
+        self.stdout.write(self.style.SUCCESS('No overlapping bookings'))
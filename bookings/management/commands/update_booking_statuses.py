@@ -1,31 +1,128 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
 from bookings.models import Booking
+from rentals.models import Car, CarOccupancy
+from rentals.availability import reservation_index
+import json
 import logging
+import os
+import time
 
 logger = logging.getLogger(__name__)
 
+# (name, current status, lookup that makes a booking due, new status); run in this order
+TRANSITIONS = [
+    ('complete', 'active', 'end_date__lt', 'completed'),
+    ('activate', 'confirmed', 'start_date__lte', 'active'),
+]
+
 class Command(BaseCommand):
     help = 'Update booking statuses (e.g., mark active bookings as completed when end date passes)'
-    
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Bookings transitioned per transaction')
+        parser.add_argument(
+            '--checkpoint',
+            help='JSON file recording progress after every batch; a crashed run started again '
+                 'with the same file resumes where it stopped'
+        )
+
     def handle(self, *args, **options):
         today = timezone.now().date()
-        
-        # Mark active bookings as completed if end date has passed
-        completed_count = Booking.objects.filter(
-            status='active',
-            end_date__lt=today
-        ).update(status='completed')
-        
-        # Mark confirmed bookings as active if start date has arrived
-        active_count = Booking.objects.filter(
-            status='confirmed',
-            start_date__lte=today
-        ).update(status='active')
-        
+        batch_size = options['batch_size']
+        if batch_size < 1:
+            raise CommandError('--batch-size must be at least 1')
+
+        checkpoint = self.load_checkpoint(options['checkpoint'], today)
+        started = time.monotonic()
+        counts = {}
+
+        for name, from_status, lookup, to_status in TRANSITIONS:
+            if name in checkpoint['done']:
+                self.stdout.write(f'Skipping {name}: already finished in an earlier run')
+                counts[name] = 0
+                continue
+
+            last_id = checkpoint['last_id'] if checkpoint['phase'] == name else 0
+            counts[name] = 0
+            due = Booking.objects.filter(status=from_status, **{lookup: today})
+
+            while True:
+                rows = list(due.filter(pk__gt=last_id).order_by('pk').values_list('pk', 'car_id')[:batch_size])
+                if not rows:
+                    break
+                counts[name] += self.transition(rows, from_status, to_status)
+                last_id = rows[-1][0]
+                checkpoint.update(phase=name, last_id=last_id)
+                self.save_checkpoint(options['checkpoint'], checkpoint)
+
+            checkpoint['done'].append(name)
+            checkpoint.update(phase=None, last_id=0)
+            self.save_checkpoint(options['checkpoint'], checkpoint)
+
+        if options['checkpoint'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+
+        elapsed = time.monotonic() - started
+        total = counts['complete'] + counts['activate']
+        rate = total / elapsed if elapsed > 0 else 0
         self.stdout.write(
             self.style.SUCCESS(
-                f'Successfully updated {completed_count} completed and {active_count} active bookings.'
+                f"Successfully updated {counts['complete']} completed and {counts['activate']} active bookings "
+                f"in {elapsed:.2f}s ({rate:.0f} rows/s)."
             )
         )
-        logger.info(f"Booking status update: {completed_count} completed, {active_count} activated")
\ No newline at end of file
+        logger.info(f"Booking status update: {counts['complete']} completed, {counts['activate']} activated, {rate:.0f} rows/s")
+
+    def transition(self, rows, from_status, to_status):
+        """Move one batch to its new status and update car availability in the same transaction"""
+        car_of = dict(rows)
+
+        with transaction.atomic():
+            # Re-check the current status so rows changed since they were read are left alone
+            booking_ids = list(
+                Booking.objects.select_for_update()
+                .filter(pk__in=list(car_of), status=from_status)
+                .values_list('pk', flat=True)
+            )
+            if not booking_ids:
+                return 0
+            car_ids = {car_of[pk] for pk in booking_ids}
+            now = timezone.now()
+            updated = Booking.objects.filter(pk__in=booking_ids).update(status=to_status, updated_at=now)
+            CarOccupancy.objects.filter(source='booking', source_id__in=booking_ids).update(status=to_status)
+
+            if to_status == 'active':
+                Car.objects.filter(pk__in=car_ids, is_available=True).update(is_available=False, updated_at=now)
+            else:
+                # Same rule as Booking.update_car_availability: free the car unless it is still in use
+                still_in_use = CarOccupancy.objects.filter(car=OuterRef('pk'), status__in=['confirmed', 'active'])
+                Car.objects.filter(pk__in=car_ids, is_available=False).exclude(Exists(still_in_use)).update(
+                    is_available=True, updated_at=now
+                )
+
+        for car_id in car_ids:
+            reservation_index.invalidate(car_id)
+        return updated
+
+    def load_checkpoint(self, path, today):
+        checkpoint = {'date': today.isoformat(), 'phase': None, 'last_id': 0, 'done': []}
+        if not path or not os.path.exists(path):
+            return checkpoint
+        with open(path) as f:
+            saved = json.load(f)
+        if saved.get('date') != checkpoint['date']:
+            self.stdout.write(self.style.WARNING(f"Ignoring checkpoint from {saved.get('date')}"))
+            return checkpoint
+        self.stdout.write(f"Resuming from checkpoint: phase {saved['phase']}, after booking #{saved['last_id']}")
+        return saved
+
+    def save_checkpoint(self, path, checkpoint):
+        if not path:
+            return
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp_path, path)
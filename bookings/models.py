@@ -1,10 +1,12 @@
-from django.db import models
+from django.db import models, transaction
 from django.conf import settings
 from django.core.validators import MinValueValidator
 from django.utils import timezone
-from rentals.models import Car
+from rentals.models import Car, CarOccupancy, OwnerMonthlyStats
+from carrentalsystem.cache_tags import TaggedQuerySet
+from carrentalsystem.tracking import FieldTrackerMixin
 
-class Booking(models.Model):
+class Booking(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending'),
         ('confirmed', 'Confirmed'),
@@ -37,12 +39,20 @@ class Booking(models.Model):
     dropoff_location = models.CharField(max_length=255, blank=True, null=True)
     special_requests = models.TextField(blank=True, null=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['car', 'start_date', 'end_date']),
             models.Index(fields=['status', 'payment_status']),
+            # Due-transition lookups in update_booking_statuses
+            models.Index(fields=['status', 'end_date']),
+            models.Index(fields=['status', 'start_date']),
+            # Keyset pagination of a customer's bookings and rental history
+            models.Index(fields=['customer', '-created_at', '-id']),
+            models.Index(fields=['customer', 'status', '-created_at', '-id']),
         ]
         constraints = [
             models.CheckConstraint(
@@ -53,42 +63,61 @@ class Booking(models.Model):
         verbose_name = 'Booking'
         verbose_name_plural = 'Bookings'
     
+    tracked_fields = ('status', 'start_date', 'end_date', 'payment_status', 'total_amount')
+    
     def __str__(self):
         return f"Booking #{self.id} - {self.customer.username} - {self.car}"
     
     def save(self, *args, **kwargs):
-        # Calculate total days automatically
-        if self.start_date and self.end_date:
+        # Calculate total days automatically when the dates change
+        if self.start_date and self.end_date and (self.has_changed('start_date') or self.has_changed('end_date')):
             self.total_days = (self.end_date - self.start_date).days
             if self.total_days > 0 and hasattr(self, 'car') and self.car:
                 self.total_amount = self.total_days * self.car.daily_rate
         
-        # Update car availability based on booking status
-        if self.pk:
-            old_status = Booking.objects.get(pk=self.pk).status
-            if old_status != self.status:
-                self.update_car_availability()
-        else:
-            # New booking - make car temporarily unavailable
-            if self.status in ['confirmed', 'active']:
-                self.car.is_available = False
-                self.car.save()
-        
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Update car availability based on booking status
+            if not self._state.adding:
+                old_status = self.get_loaded_value('status')
+                if old_status != self.status:
+                    self.update_car_availability(old_status)
+            else:
+                # New booking - make car temporarily unavailable
+                if self.status in ['confirmed', 'active']:
+                    self.set_car_availability(False)
+            
+            old_paid_amount = None if self._state.adding else self.paid_amount(
+                self.get_loaded_value('payment_status'), self.get_loaded_value('total_amount')
+            )
+            super().save(*args, **kwargs)
+            CarOccupancy.record('booking', self)
+            OwnerMonthlyStats.record_reservation(self, old_paid_amount)
     
-    def update_car_availability(self):
+    @staticmethod
+    def paid_amount(payment_status, total_amount):
+        """Revenue a booking counts for in the owner's monthly stats"""
+        return total_amount if payment_status == 'paid' else 0
+    
+    def update_car_availability(self, old_status=None):
         """Update car availability based on booking status"""
         if self.status in ['confirmed', 'active']:
-            self.car.is_available = False
+            if old_status not in ['confirmed', 'active']:
+                self.set_car_availability(False)
         elif self.status in ['completed', 'cancelled']:
             # Check if there are no other active bookings for this car
             active_bookings = Booking.objects.filter(
-                car=self.car,
+                car_id=self.car_id,
                 status__in=['confirmed', 'active'],
             ).exclude(pk=self.pk)
             if not active_bookings.exists():
-                self.car.is_available = True
-        self.car.save()
+                self.set_car_availability(True)
+    
+    def set_car_availability(self, is_available):
+        if Booking.car.is_cached(self):
+            Car.set_availability(self.car_id, is_available, self.car.owner_id)
+            self.car.is_available = is_available
+        else:
+            Car.set_availability(self.car_id, is_available)
     
     @property
     def is_active(self):
@@ -127,18 +156,22 @@ class BookingPayment(models.Model):
     def __str__(self):
         return f"Payment for Booking #{self.booking.id}"
 
-class BookingReview(models.Model):
+class BookingReview(FieldTrackerMixin, models.Model):
     booking = models.OneToOneField(Booking, on_delete=models.CASCADE, related_name='review')
     rating = models.IntegerField(choices=[(i, f'{i} Star{"s" if i > 1 else ""}') for i in range(1, 6)])
     comment = models.TextField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Booking Review'
         verbose_name_plural = 'Booking Reviews'
     
+    tracked_fields = ('rating',)
+    
     def __str__(self):
         return f"Review for Booking #{self.booking.id} - {self.rating} stars"
 
@@ -148,10 +181,79 @@ class FavoriteCar(models.Model):
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='favorited_by')
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         unique_together = ['customer', 'car']
         verbose_name = 'Favorite Car'
         verbose_name_plural = 'Favorite Cars'
+        indexes = [
+            # Keyset pagination of a customer's favorites
+            models.Index(fields=['customer', '-created_at', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.customer.username} - {self.car}"
+
+class OutgoingEmail(models.Model):
+    """Transactional outbox for notification emails.
+    
+    Rows are written in the same transaction as the change that triggers
+    them and delivered later by ``manage.py send_queued_emails``, so SMTP
+    latency and outages never reach the request path.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    from_email = models.CharField(max_length=255)
+    recipients = models.JSONField(default=list)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    
+    class Meta:
+        ordering = ['id']
+        verbose_name = 'Outgoing Email'
+        verbose_name_plural = 'Outgoing Emails'
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.subject} -> {', '.join(self.recipients)} ({self.status})"
+
+class CarRecommendation(models.Model):
+    """Top-K recommended cars, written offline by ``build_recommendations``.
+    
+    Rows with a ``customer`` are personal recommendations; rows without one
+    are the popularity lists, per car type or fleet wide (blank car type).
+    """
+    customer = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='car_recommendations', null=True, blank=True
+    )
+    car_type = models.CharField(max_length=20, blank=True)
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+    
+    class Meta:
+        ordering = ['rank']
+        verbose_name = 'Car Recommendation'
+        verbose_name_plural = 'Car Recommendations'
+        indexes = [
+            models.Index(fields=['customer', 'rank']),
+            models.Index(fields=['car_type', 'rank'], condition=models.Q(customer__isnull=True), name='recommendation_popular_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.customer.username} - {self.car}"
\ No newline at end of file
+        scope = f"customer {self.customer_id}" if self.customer_id else (self.car_type or 'all cars')
+        return f"#{self.rank} for {scope}: car {self.car_id} ({self.score:.3f})"
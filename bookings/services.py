@@ -0,0 +1,52 @@
+import logging
+import random
+import time
+
+from django.db import OperationalError, transaction
+
+from rentals.availability import reservation_index
+from rentals.models import Car
+
+logger = logging.getLogger(__name__)
+
+
+class CarUnavailableError(Exception):
+    """Raised when the requested dates overlap an existing reservation"""
+
+
+class BookingService:
+    """Race-free creation of bookings.
+    
+    The availability check and the insert run in one transaction that first
+    locks the car row (``SELECT ... FOR UPDATE`` on PostgreSQL), so competing
+    requests for the same car are serialized while bookings for other cars
+    proceed in parallel. SQLite has no row locks; there the database runs
+    ``BEGIN IMMEDIATE`` transactions (see ``DATABASES`` in settings), which
+    serializes writers for the whole file. Lock timeouts, deadlocks and
+    serialization failures surface as ``OperationalError`` and are retried
+    with jittered exponential backoff.
+    """
+    max_attempts = 5
+    backoff_base = 0.05  # seconds
+    backoff_max = 1.0
+    
+    @classmethod
+    def reserve(cls, booking):
+        """Save a new booking if its car is free for the dates, else raise CarUnavailableError"""
+        for attempt in range(1, cls.max_attempts + 1):
+            try:
+                with transaction.atomic():
+                    Car.objects.select_for_update().only('id').get(pk=booking.car_id)
+                    if reservation_index.has_overlap_in_db(booking.car_id, booking.start_date, booking.end_date):
+                        raise CarUnavailableError(f"Car #{booking.car_id} is not available for the selected dates")
+                    booking.save()
+                return booking
+            except OperationalError as e:
+                # The transaction was rolled back; make sure the retry inserts again
+                booking.pk = None
+                booking._state.adding = True
+                if attempt == cls.max_attempts:
+                    logger.error(f"Giving up reserving car #{booking.car_id} after {attempt} attempts: {str(e)}")
+                    raise
+                delay = min(cls.backoff_max, cls.backoff_base * 2 ** (attempt - 1))
+                time.sleep(random.uniform(0, delay))
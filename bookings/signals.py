@@ -15,17 +15,14 @@ def handle_booking_status_change(sender, instance, created, **kwargs):
         EmailService.send_owner_notification(instance, 'Booking Request')
         logger.info(f"New booking created: #{instance.id}")
     else:
-        # Booking updated - check if status changed
-        try:
-            old_instance = Booking.objects.get(pk=instance.pk)
-            if old_instance.status != instance.status:
-                if instance.status == 'confirmed':
-                    EmailService.send_booking_confirmation(instance)
-                elif instance.status == 'cancelled':
-                    EmailService.send_booking_cancellation(instance)
-                logger.info(f"Booking #{instance.id} status changed from {old_instance.status} to {instance.status}")
-        except Booking.DoesNotExist:
-            pass
+        # Booking updated - check if status changed (the tracked value is still the pre-save one here)
+        old_status = instance.get_loaded_value('status')
+        if old_status != instance.status:
+            if instance.status == 'confirmed':
+                EmailService.send_booking_confirmation(instance)
+            elif instance.status == 'cancelled':
+                EmailService.send_booking_cancellation(instance)
+            logger.info(f"Booking #{instance.id} status changed from {old_status} to {instance.status}")
 
 @receiver(post_save, sender=BookingReview)
 def handle_new_review(sender, instance, created, **kwargs):
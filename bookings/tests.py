@@ -1,3 +1,149 @@
-from django.test import TestCase
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
-# Create your tests here.
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from carrentalsystem.testing import make_car
+from rentals.models import CarOccupancy
+from users.models import User
+from .management.commands.update_booking_statuses import Command as UpdateBookingStatuses
+from .models import Booking
+from .services import BookingService, CarUnavailableError
+
+
+class BookingServiceConcurrencyTests(TransactionTestCase):
+    threads = 8
+
+    def setUp(self):
+        owner_user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.car = make_car(owner_user)
+
+    def attempt(self, dates):
+        start_date, end_date = dates
+        booking = Booking(
+            customer_id=self.customer.id, car_id=self.car.id, start_date=start_date, end_date=end_date,
+            total_days=(end_date - start_date).days, total_amount=0, pickup_location='Depot',
+        )
+        try:
+            BookingService.reserve(booking)
+            return 'created'
+        except CarUnavailableError:
+            return 'conflict'
+        finally:
+            connection.close()
+
+    def test_concurrent_reservations_never_overlap(self):
+        first_day = timezone.now().date() + timedelta(days=1)
+        # Every thread asks for an overlapping range, several times over
+        attempts = [
+            (first_day + timedelta(days=offset % 3), first_day + timedelta(days=offset % 3 + 2))
+            for offset in range(self.threads * 3)
+        ]
+        with ThreadPoolExecutor(max_workers=self.threads) as executor:
+            outcomes = list(executor.map(self.attempt, attempts))
+
+        intervals = sorted(Booking.objects.filter(car=self.car).values_list('start_date', 'end_date'))
+        for (_, previous_end), (start_date, _) in zip(intervals, intervals[1:]):
+            self.assertGreaterEqual(start_date, previous_end)
+        self.assertEqual(outcomes.count('created'), len(intervals))
+        self.assertGreaterEqual(outcomes.count('created'), 1)
+        self.assertEqual(outcomes.count('created') + outcomes.count('conflict'), len(attempts))
+
+
+class UpdateBookingStatusesTests(TestCase):
+    def setUp(self):
+        owner_user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.car = make_car(owner_user)
+
+    def make_booking(self, status, days_ago):
+        start_date = timezone.now().date() - timedelta(days=days_ago)
+        return Booking.objects.create(
+            customer=self.customer, car=self.car, start_date=start_date, end_date=start_date + timedelta(days=2),
+            total_days=2, total_amount=100, status=status, pickup_location='Depot',
+        )
+
+    def test_transition_skips_bookings_changed_since_they_were_read(self):
+        due = self.make_booking('active', days_ago=10)
+        cancelled = self.make_booking('active', days_ago=5)
+        rows = [(due.pk, self.car.pk), (cancelled.pk, self.car.pk)]
+        # Cancelled between the command's read and its update
+        cancelled.status = 'cancelled'
+        cancelled.save()
+
+        updated = UpdateBookingStatuses().transition(rows, 'active', 'completed')
+
+        self.assertEqual(updated, 1)
+        occupancy = dict(CarOccupancy.objects.filter(source='booking').values_list('source_id', 'status'))
+        self.assertEqual(occupancy, {due.pk: 'completed', cancelled.pk: 'cancelled'})
+        cancelled.refresh_from_db()
+        self.assertEqual(cancelled.status, 'cancelled')
+
+
+class BookingSaveQueryTests(TestCase):
+    """Statements per status change of a booking loaded with its car and customer"""
+
+    def setUp(self):
+        owner_user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        start_date = timezone.now().date() + timedelta(days=1)
+        self.booking = Booking.objects.create(
+            customer=customer, car=make_car(owner_user), start_date=start_date,
+            end_date=start_date + timedelta(days=2), total_days=2, total_amount=100, pickup_location='Depot',
+        )
+
+    def assertSave(self, queries, status, **changes):
+        booking = Booking.objects.select_related('car', 'customer').get(pk=self.booking.pk)
+        booking.status = status
+        for name, value in changes.items():
+            setattr(booking, name, value)
+        with self.assertNumQueries(queries):
+            booking.save()
+
+    def test_confirm_with_payment(self):
+        # Savepoint, car availability, booking, confirmation email in the outbox (savepoint, insert,
+        # release), ledger row, monthly revenue, release
+        self.assertSave(9, 'confirmed', payment_status='paid')
+
+    def test_activate(self):
+        self.assertSave(9, 'confirmed', payment_status='paid')
+        # Savepoint, booking, ledger row, release
+        self.assertSave(4, 'active')
+
+    def test_complete(self):
+        self.assertSave(9, 'confirmed', payment_status='paid')
+        self.assertSave(4, 'active')
+        # Savepoint, other open bookings, car availability, booking, ledger row, release
+        self.assertSave(6, 'completed')
+
+
+class BatchAvailabilityCheckTests(TestCase):
+    def setUp(self):
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.booked = make_car(User.objects.create_user('owner', 'owner@example.com', 'password'))
+        self.free = make_car(User.objects.create_user('other', 'other@example.com', 'password'))
+        self.start_date = timezone.now().date() + timedelta(days=1)
+        self.end_date = self.start_date + timedelta(days=2)
+        Booking.objects.create(
+            customer=self.customer, car=self.booked, start_date=self.start_date, end_date=self.end_date,
+            total_days=2, total_amount=100, status='confirmed', pickup_location='Depot',
+        )
+        self.client.force_login(self.customer)
+
+    def check(self, **params):
+        response = self.client.get(reverse('bookings:check_availability_batch'), {
+            'start_date': self.start_date.isoformat(), 'end_date': self.end_date.isoformat(), **params,
+        })
+        self.assertEqual(response.status_code, 200)
+        return {car['car_id']: car['available'] for car in response.json()['cars']}
+
+    def test_search_filters_report_booked_cars_as_unavailable(self):
+        self.assertEqual(self.check(city='Springfield'), {self.booked.pk: False, self.free.pk: True})
+
+    def test_car_ids_report_booked_cars_as_unavailable(self):
+        car_ids = f'{self.booked.pk},{self.free.pk}'
+        self.assertEqual(self.check(car_ids=car_ids), {self.booked.pk: False, self.free.pk: True})
@@ -28,4 +28,5 @@ urlpatterns = [
     
     # API Endpoints
     path('api/car/<int:car_id>/availability/', views.BookingAvailabilityCheckView.as_view(), name='check_availability'),
+    path('api/availability/', views.BatchAvailabilityCheckView.as_view(), name='check_availability_batch'),
 ]
\ No newline at end of file
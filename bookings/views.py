@@ -4,15 +4,20 @@ from django.contrib import messages
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy, reverse
 from django.utils import timezone
-from django.db.models import Q, Count, Sum, Avg
-from django.http import JsonResponse, Http404
+from django.db.models import Q, Count, Sum, Avg, Exists, OuterRef
+from django.http import JsonResponse, Http404, HttpResponseRedirect
 from django.core.exceptions import PermissionDenied, ValidationError
 from datetime import datetime, timedelta
+from decimal import Decimal
 import logging
 import json
 
-from .models import Booking, BookingReview, FavoriteCar
-from rentals.models import Car, Rental
+from .models import Booking, BookingReview, CarRecommendation, FavoriteCar
+from rentals.models import Car, CarOccupancy, Rental
+from rentals.availability import reservation_index, BLOCKING_STATUSES
+from rentals.forms import CarSearchForm
+from carrentalsystem.pagination import CursorPaginationMixin
+from .services import BookingService, CarUnavailableError
 from .forms import BookingForm, BookingReviewForm, BookingFilterForm, PaymentForm
 
 logger = logging.getLogger(__name__)
@@ -74,36 +79,26 @@ class CustomerDashboardView(LoginRequiredMixin, TemplateView):
             
         return context
     
-    def get_recommended_cars(self, user):
-        """Get personalized car recommendations"""
+    def get_recommended_cars(self, user, limit=6):
+        """Get personalized car recommendations precomputed by build_recommendations"""
         try:
-            # Base queryset - available cars
             cars = Car.objects.filter(is_available=True, is_active=True)
             
-            # If user has previous bookings, recommend similar cars
-            user_bookings = Booking.objects.filter(customer=user, status='completed')
-            if user_bookings.exists():
-                # Get most booked car type by user
-                favorite_type = user_bookings.values('car__car_type').annotate(
-                    count=Count('id')
-                ).order_by('-count').first()
-                
-                if favorite_type:
-                    cars = cars.filter(car_type=favorite_type['car__car_type'])
-            
-            # Add highly rated cars as fallback
-            popular_cars = cars.annotate(
-                avg_rating=Avg('rentals__review__rating', filter=Q(rentals__status='completed')),
-                booking_count=Count('bookings')
-            ).filter(
-                Q(avg_rating__gte=4) | Q(booking_count__gte=1)
-            ).order_by('-avg_rating', '-booking_count')[:6]
+            # Personal list first; customers without history get the fleet-wide popularity list
+            for scope in (Q(customer=user), Q(customer__isnull=True, car_type='')):
+                recommendations = CarRecommendation.objects.filter(
+                    scope, car__is_available=True, car__is_active=True
+                ).select_related('car').order_by('rank')[:limit]
+                recommended = [recommendation.car for recommendation in recommendations]
+                if recommended:
+                    return recommended
             
-            return popular_cars
+            # Nothing built yet
+            return cars.order_by('-avg_rating')[:limit]
             
         except Exception as e:
             logger.error(f"Error getting recommended cars: {str(e)}")
-            return Car.objects.filter(is_available=True, is_active=True)[:6]
+            return Car.objects.filter(is_available=True, is_active=True)[:limit]
     
     def get_member_tier(self, completed_bookings):
         """Determine customer membership tier"""
@@ -117,7 +112,7 @@ class CustomerDashboardView(LoginRequiredMixin, TemplateView):
             return 'new'
 
 
-class BookingListView(LoginRequiredMixin, ListView):
+class BookingListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """View for listing all customer bookings with filtering and pagination"""
     model = Booking
     template_name = 'bookings/my_bookings.html'
@@ -209,17 +204,19 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
             start_date = form.cleaned_data['start_date']
             end_date = form.cleaned_data['end_date']
             
-            # Check car availability for the selected dates
-            if not self.is_car_available(start_date, end_date):
-                form.add_error(None, 'Car is not available for the selected dates. Please choose different dates.')
-                return self.form_invalid(form)
-            
             # Calculate total amount
             total_days = (end_date - start_date).days
             form.instance.total_days = total_days
             form.instance.total_amount = total_days * self.car.daily_rate
             
-            response = super().form_valid(form)
+            # Check car availability and insert atomically
+            try:
+                self.object = BookingService.reserve(form.instance)
+            except CarUnavailableError:
+                form.add_error(None, 'Car is not available for the selected dates. Please choose different dates.')
+                return self.form_invalid(form)
+            
+            response = HttpResponseRedirect(self.get_success_url())
             
             messages.success(
                 self.request, 
@@ -236,16 +233,6 @@ class BookingCreateView(LoginRequiredMixin, CreateView):
             messages.error(self.request, 'An error occurred while creating the booking. Please try again.')
             return self.form_invalid(form)
     
-    def is_car_available(self, start_date, end_date):
-        """Check if car is available for the given date range"""
-        conflicting_bookings = Booking.objects.filter(
-            car=self.car,
-            status__in=['pending', 'confirmed', 'active'],
-            start_date__lt=end_date,
-            end_date__gt=start_date
-        )
-        return not conflicting_bookings.exists()
-    
     def get_success_url(self):
         return reverse('bookings:booking_payment', kwargs={'pk': self.object.pk})
 
@@ -255,7 +242,7 @@ class BookingCancelView(LoginRequiredMixin, View):
     
     def post(self, request, pk):
         booking = get_object_or_404(
-            Booking.objects.filter(customer=request.user),
+            Booking.objects.filter(customer=request.user).select_related('car', 'customer'),
             pk=pk
         )
         
@@ -293,7 +280,7 @@ class BookingCancelView(LoginRequiredMixin, View):
         return redirect('bookings:my_bookings')
 
 
-class RentalHistoryView(LoginRequiredMixin, ListView):
+class RentalHistoryView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """View for completed rentals with review functionality"""
     model = Booking
     template_name = 'bookings/rental_history.html'
@@ -366,7 +353,7 @@ class ProcessPaymentView(LoginRequiredMixin, View):
     
     def post(self, request, pk):
         booking = get_object_or_404(
-            Booking.objects.filter(customer=request.user, status='pending'),
+            Booking.objects.filter(customer=request.user, status='pending').select_related('car', 'customer'),
             pk=pk
         )
         
@@ -429,7 +416,7 @@ class FavoriteCarView(LoginRequiredMixin, View):
         return redirect('rentals:car_detail', pk=car_id)
 
 
-class FavoriteListView(LoginRequiredMixin, ListView):
+class FavoriteListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """View to show user's favorite cars"""
     model = FavoriteCar
     template_name = 'bookings/favorite_cars.html'
@@ -448,45 +435,17 @@ class BookingAvailabilityCheckView(LoginRequiredMixin, View):
     def get(self, request, car_id):
         try:
             car = get_object_or_404(Car, id=car_id, is_active=True)
-            start_date = request.GET.get('start_date')
-            end_date = request.GET.get('end_date')
-            
-            if not start_date or not end_date:
-                return JsonResponse({'error': 'Start and end dates are required'}, status=400)
-            
-            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-            
-            # Validate dates
-            if start_date >= end_date:
-                return JsonResponse({'error': 'End date must be after start date'}, status=400)
-            
-            if start_date < timezone.now().date():
-                return JsonResponse({'error': 'Start date cannot be in the past'}, status=400)
+            start_date, end_date, error = self.get_date_range(request)
+            if error:
+                return error
             
             # Check availability
-            is_available = not Booking.objects.filter(
-                car=car,
-                status__in=['pending', 'confirmed', 'active'],
-                start_date__lt=end_date,
-                end_date__gt=start_date
-            ).exists()
-            
-            # Calculate total amount
-            total_days = (end_date - start_date).days
-            total_amount = total_days * car.daily_rate if total_days > 0 else 0
-            
-            # Calculate any discounts
-            discount = self.calculate_discount(total_days, request.user)
-            final_amount = total_amount - discount
+            is_available = reservation_index.is_available(car.id, start_date, end_date)
             
+            completed_bookings = Booking.objects.filter(customer=request.user, status='completed').count()
             return JsonResponse({
                 'available': is_available,
-                'total_days': total_days,
-                'total_amount': float(total_amount),
-                'discount': float(discount),
-                'final_amount': float(final_amount),
-                'daily_rate': float(car.daily_rate),
+                **self.get_quote(car.daily_rate, start_date, end_date, completed_bookings),
                 'car_name': f"{car.make} {car.model}"
             })
             
@@ -496,24 +455,123 @@ class BookingAvailabilityCheckView(LoginRequiredMixin, View):
             logger.error(f"Error checking availability: {str(e)}")
             return JsonResponse({'error': 'Invalid request'}, status=400)
     
-    def calculate_discount(self, total_days, user):
+    def get_date_range(self, request):
+        """Parse and validate start/end dates, returning (start, end, error_response)"""
+        start_date = request.GET.get('start_date')
+        end_date = request.GET.get('end_date')
+        
+        if not start_date or not end_date:
+            return None, None, JsonResponse({'error': 'Start and end dates are required'}, status=400)
+        
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        
+        # Validate dates
+        if start_date >= end_date:
+            return None, None, JsonResponse({'error': 'End date must be after start date'}, status=400)
+        
+        if start_date < timezone.now().date():
+            return None, None, JsonResponse({'error': 'Start date cannot be in the past'}, status=400)
+        
+        return start_date, end_date, None
+    
+    def get_quote(self, daily_rate, start_date, end_date, completed_bookings):
+        """Price a date range, including duration and loyalty discounts"""
+        total_days = (end_date - start_date).days
+        total_amount = total_days * daily_rate if total_days > 0 else 0
+        discount = self.calculate_discount(total_days, daily_rate, completed_bookings)
+        return {
+            'total_days': total_days,
+            'total_amount': float(total_amount),
+            'discount': float(discount),
+            'final_amount': float(total_amount - discount),
+            'daily_rate': float(daily_rate),
+        }
+    
+    def calculate_discount(self, total_days, daily_rate, completed_bookings):
         """Calculate discount based on rental duration and user loyalty"""
-        discount = 0
+        discount = Decimal('0')
         
         # Long-term rental discount
         if total_days >= 7:
-            discount += (total_days * user.car.daily_rate) * 0.1  # 10% off for 7+ days
+            discount += (total_days * daily_rate) * Decimal('0.10')  # 10% off for 7+ days
         elif total_days >= 3:
-            discount += (total_days * user.car.daily_rate) * 0.05  # 5% off for 3-6 days
+            discount += (total_days * daily_rate) * Decimal('0.05')  # 5% off for 3-6 days
         
         # Loyalty discount based on completed bookings
-        completed_bookings = Booking.objects.filter(customer=user, status='completed').count()
         if completed_bookings >= 5:
-            discount += (total_days * user.car.daily_rate) * 0.05  # Additional 5% for loyal customers
+            discount += (total_days * daily_rate) * Decimal('0.05')  # Additional 5% for loyal customers
         
         return discount
 
 
+class BatchAvailabilityCheckView(BookingAvailabilityCheckView):
+    """API endpoint to check availability and quotes for many cars at once.
+    
+    Takes ``start_date``/``end_date`` plus either ``car_ids`` (comma separated)
+    or the ``CarSearchForm`` filters, and answers with one anti-join query
+    instead of one request per car.
+    """
+    max_cars = 100
+    
+    def get(self, request):
+        try:
+            start_date, end_date, error = self.get_date_range(request)
+            if error:
+                return error
+            
+            cars = Car.objects.filter(is_active=True)
+            car_ids = [int(car_id) for car_id in request.GET.get('car_ids', '').split(',') if car_id.strip()]
+            if car_ids:
+                if len(car_ids) > self.max_cars:
+                    return JsonResponse({'error': f'At most {self.max_cars} cars can be checked at once'}, status=400)
+                cars = cars.filter(id__in=car_ids)
+            else:
+                form = CarSearchForm(request.GET)
+                if not form.is_valid():
+                    return JsonResponse({'error': 'Invalid filters', 'fields': form.errors}, status=400)
+                # Availability for the requested range is reported below, not filtered on
+                cars = form.filter_attributes(cars)
+            
+            conflicts = CarOccupancy.objects.filter(
+                car=OuterRef('pk'),
+                status__in=BLOCKING_STATUSES,
+                start_date__lt=end_date,
+                end_date__gt=start_date
+            )
+            rows = cars.annotate(is_booked=Exists(conflicts)).values('id', 'make', 'model', 'daily_rate', 'is_booked')
+            if not car_ids:
+                rows = rows[:self.max_cars]
+            completed_bookings = Booking.objects.filter(customer=request.user, status='completed').count()
+            
+            results = {
+                row['id']: {
+                    'car_id': row['id'],
+                    'available': not row['is_booked'],
+                    **self.get_quote(row['daily_rate'], start_date, end_date, completed_bookings),
+                    'car_name': f"{row['make']} {row['model']}"
+                }
+                for row in rows
+            }
+            if car_ids:
+                cars_data = [results[car_id] for car_id in car_ids if car_id in results]
+            else:
+                cars_data = list(results.values())
+            
+            return JsonResponse({
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat(),
+                'cars': cars_data,
+                'missing': [car_id for car_id in car_ids if car_id not in results],
+            })
+            
+        except ValueError:
+            return JsonResponse({'error': 'Invalid date format or car id.'}, status=400)
+        except Exception as e:
+            logger.error(f"Error checking batch availability: {str(e)}")
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+
 # Remove the PaymentWebhookView for now since it requires additional setup
 # We'll add it back when we have proper payment integration
 
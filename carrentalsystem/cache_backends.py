@@ -0,0 +1,207 @@
+"""Zero-dependency cache backend shared by every process on one host.
+
+Entries live in one SQLite file in WAL mode, so any number of gunicorn
+workers and management commands see the same cache, readers never block
+the writer, and reads are served from a memory-mapped file. ``incr`` and
+``add`` run inside ``BEGIN IMMEDIATE`` and are atomic across processes,
+which the versioned namespaces in ``carrentalsystem.caching`` rely on.
+
+    CACHES = {'default': {
+        'BACKEND': 'carrentalsystem.cache_backends.SQLiteCache',
+        'LOCATION': '/var/tmp/django_cache.sqlite3',
+        'OPTIONS': {'MAX_ENTRIES': 100000, 'MMAP_SIZE': 256 * 1024 * 1024, 'CULL_INTERVAL': 100},
+    }}
+
+Counting the entries is a full scan, so a process checks MAX_ENTRIES only
+once per ``CULL_INTERVAL`` entries it writes; the file may briefly hold a
+few intervals' worth of entries more than the limit.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# SQLite's default limit on host parameters is 999 on older builds
+BATCH_SIZE = 500
+
+
+class SQLiteCache(BaseCache):
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self.path = os.fspath(location)
+        options = params.get('OPTIONS', {})
+        self.mmap_size = int(options.get('MMAP_SIZE', 256 * 1024 * 1024))
+        self.busy_timeout = float(options.get('BUSY_TIMEOUT', 5.0))
+        self.cull_interval = max(int(options.get('CULL_INTERVAL', 100)), 1)
+        self._writes = 0
+        self._local = threading.local()
+
+    @property
+    def db(self):
+        """One connection per thread and process (connections must not cross a fork)"""
+        db = getattr(self._local, 'db', None)
+        if db is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None, check_same_thread=False)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute('PRAGMA synchronous=NORMAL')
+            db.execute(f'PRAGMA mmap_size={self.mmap_size}')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS cache_entry '
+                '(key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID'
+            )
+            db.execute('CREATE INDEX IF NOT EXISTS cache_entry_expires ON cache_entry (expires)')
+            self._local.db = db
+            self._local.pid = os.getpid()
+        return db
+
+    @contextmanager
+    def write(self):
+        """Serialize writers across processes; the lock is taken before anything is read"""
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        else:
+            db.execute('COMMIT')
+
+    def expiry(self, timeout):
+        timeout = self.get_backend_timeout(timeout)
+        return None if timeout is None else time.time() + timeout
+
+    def encode(self, value):
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.write() as db:
+            db.execute('DELETE FROM cache_entry WHERE key = ? AND expires <= ?', (key, time.time()))
+            added = db.execute(
+                'INSERT OR IGNORE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+                (key, self.encode(value), self.expiry(timeout))
+            ).rowcount
+            if added:
+                self.cull(db, 1)
+        return bool(added)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self.db.execute(
+            'SELECT value FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone()
+        return default if row is None else pickle.loads(row[0])
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.write() as db:
+            db.execute(
+                'INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)',
+                (key, self.encode(value), self.expiry(timeout))
+            )
+            self.cull(db, 1)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.write() as db:
+            return bool(db.execute(
+                'UPDATE cache_entry SET expires = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (self.expiry(timeout), key, time.time())
+            ).rowcount)
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.write() as db:
+            return bool(db.execute('DELETE FROM cache_entry WHERE key = ?', (key,)).rowcount)
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        return self.db.execute(
+            'SELECT 1 FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)', (key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        with self.write() as db:
+            row = db.execute(
+                'SELECT value, expires FROM cache_entry WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = pickle.loads(row[0]) + delta
+            db.execute('UPDATE cache_entry SET value = ? WHERE key = ?', (self.encode(value), key))
+        return value
+
+    def get_many(self, keys, version=None):
+        keyed = {self.make_and_validate_key(key, version=version): key for key in keys}
+        found = {}
+        now = time.time()
+        names = list(keyed)
+        for start in range(0, len(names), BATCH_SIZE):
+            batch = names[start:start + BATCH_SIZE]
+            rows = self.db.execute(
+                f"SELECT key, value FROM cache_entry WHERE key IN ({', '.join('?' * len(batch))}) "
+                "AND (expires IS NULL OR expires > ?)",
+                (*batch, now)
+            )
+            for key, value in rows:
+                found[keyed[key]] = pickle.loads(value)
+        return found
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.expiry(timeout)
+        rows = [
+            (self.make_and_validate_key(key, version=version), self.encode(value), expires)
+            for key, value in data.items()
+        ]
+        with self.write() as db:
+            db.executemany('INSERT OR REPLACE INTO cache_entry (key, value, expires) VALUES (?, ?, ?)', rows)
+            self.cull(db, len(rows))
+        return []
+
+    def delete_many(self, keys, version=None):
+        names = [self.make_and_validate_key(key, version=version) for key in keys]
+        with self.write() as db:
+            for start in range(0, len(names), BATCH_SIZE):
+                batch = names[start:start + BATCH_SIZE]
+                db.execute(f"DELETE FROM cache_entry WHERE key IN ({', '.join('?' * len(batch))})", batch)
+
+    def clear(self):
+        with self.write() as db:
+            db.execute('DELETE FROM cache_entry')
+
+    def cull(self, db, written):
+        """Drop expired entries, then the soonest-expiring ones, once MAX_ENTRIES is exceeded"""
+        # Unlocked, so concurrent threads may skip or repeat a check; either is harmless
+        self._writes += written
+        if self._writes < self.cull_interval:
+            return
+        self._writes = 0
+        count = db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count <= self._max_entries:
+            return
+        db.execute('DELETE FROM cache_entry WHERE expires <= ?', (time.time(),))
+        count = db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+        if count > self._max_entries:
+            excess = count // self._cull_frequency if self._cull_frequency else count
+            # Entries without expiry (namespace versions) go last
+            db.execute(
+                'DELETE FROM cache_entry WHERE key IN '
+                '(SELECT key FROM cache_entry ORDER BY expires IS NULL, expires LIMIT ?)',
+                (excess,)
+            )
+
+    def close(self, **kwargs):
+        # Connections are kept for the life of the thread; closing per request would defeat mmap
+        pass
@@ -0,0 +1,207 @@
+"""Cache tags: which cached data a model change makes stale.
+
+Each registered model declares tag templates filled from its fields, e.g.
+
+    register(Rental, 'car:{car_id}', 'owner:{car__owner_id}')
+
+A tag is a ``carrentalsystem.caching`` namespace. Saving or deleting a row,
+or changing rows through ``TaggedQuerySet.update()``, bumps the versions
+of its tags once the transaction commits. Cached data is stored under
+``tagged_key(tags, ...)``, which embeds the current version of every tag,
+so invalidation costs one ``incr`` per tag and never scans keys.
+
+Every parameterized tag also depends on its model-wide form: ``car:12`` on
+``car:*``. Changes that would bump more than ``CACHE_TAGS_ROW_LIMIT`` rows'
+tags, or whose values are unknown without a query (a lookup through a
+relation that is not loaded), bump the model-wide tag once instead.
+
+Views declare their tags with ``CacheTagsMixin``, plain functions (such as
+template fragments) with ``@cached_by_tags``.
+"""
+import functools
+import hashlib
+import inspect
+import string
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models.signals import post_delete, post_save
+
+from .caching import bump_version, get_or_compute, get_versions, params_digest
+
+# model -> [(template, field lookups used by the template)]
+_registry = {}
+
+
+def register(model, *templates):
+    """Bump ``templates`` (filled from the changed row) whenever a ``model`` row changes"""
+    _registry[model] = [
+        (template, [field for _, field, _, _ in string.Formatter().parse(template) if field])
+        for template in templates
+    ]
+    uid = f'cache_tags:{model._meta.label}'
+    post_save.connect(_bump_instance_tags, sender=model, weak=False, dispatch_uid=uid)
+    post_delete.connect(_bump_instance_tags, sender=model, weak=False, dispatch_uid=uid)
+
+
+def _bump_instance_tags(sender, instance, raw=False, **kwargs):
+    # Fixture loading saves rows before the ones they point to
+    if not raw:
+        bump_tags(tags_for(instance))
+
+
+# Stands for a value that would take a query to read
+UNKNOWN = object()
+
+
+def coarse_tag(tag):
+    """Model-wide form of a parameterized tag (``car:12`` -> ``car:*``), else None"""
+    prefix, sep, _ = tag.partition(':')
+    return f'{prefix}:*' if sep else None
+
+
+def _coarse(template):
+    return coarse_tag(template) if '{' in template else template
+
+
+def _fill(templates, values):
+    """Tags of one row; templates referring to a NULL value are skipped, unknown ones made coarse"""
+    tags = set()
+    for template, fields in templates:
+        row_values = [values.get(field, UNKNOWN) for field in fields]
+        if any(value is UNKNOWN for value in row_values):
+            tags.add(_coarse(template))
+        elif all(value is not None for value in row_values):
+            tags.add(template.format_map(values))
+    return tags
+
+
+def _resolve(instance, lookup):
+    """Value of ``lookup`` (such as ``car__owner_id``) from the instance and its loaded relations"""
+    name, _, rest = lookup.partition('__')
+    if not rest:
+        return getattr(instance, name, None)
+    if name not in instance._state.fields_cache:
+        return UNKNOWN
+    related = instance._state.fields_cache[name]
+    return None if related is None else _resolve(related, rest)
+
+
+def tags_for(instance):
+    templates = _registry.get(type(instance), [])
+    lookups = {field for _, fields in templates for field in fields}
+    return _fill(templates, {lookup: _resolve(instance, lookup) for lookup in lookups})
+
+
+def tags_from_values(model, **values):
+    """Tags of a ``model`` row from known field values; the other templates are made coarse"""
+    return _fill(_registry.get(model, []), values)
+
+
+def coarse_tags(model):
+    """Tags covering every row of ``model``"""
+    return {_coarse(template) for template, _ in _registry.get(model, [])}
+
+
+def tags_for_queryset(queryset):
+    """Tags of every row of ``queryset``, read in one query; coarse past ``CACHE_TAGS_ROW_LIMIT`` rows"""
+    templates = _registry.get(queryset.model, [])
+    lookups = sorted({field for _, fields in templates for field in fields})
+    if not lookups:
+        return _fill(templates, {})
+    limit = getattr(settings, 'CACHE_TAGS_ROW_LIMIT', 100)
+    rows = list(queryset.order_by().values_list(*lookups).distinct()[:limit + 1])
+    if len(rows) > limit:
+        return coarse_tags(queryset.model)
+    tags = set()
+    for row in rows:
+        tags |= _fill(templates, dict(zip(lookups, row)))
+    return tags
+
+
+def bump_tags(tags):
+    """Expire everything cached under any of ``tags`` once the current transaction commits"""
+    tags = set(tags)
+    if tags:
+        transaction.on_commit(functools.partial(_bump_now, tags))
+
+
+def _bump_now(tags):
+    for tag in tags:
+        bump_version(tag)
+
+
+def tag_versions(tags):
+    """{tag: version} of ``tags`` and of the model-wide tags they depend on, in one round trip"""
+    tags = set(tags)
+    tags |= {coarse_tag(tag) for tag in tags} - {None}
+    return get_versions(sorted(tags))
+
+
+def tagged_key(tags, *parts):
+    """Cache key that changes as soon as any of ``tags`` (or its model-wide tag) is bumped"""
+    versions = tag_versions(tags)
+    digest = hashlib.md5(';'.join(f'{tag}={version}' for tag, version in versions.items()).encode())
+    return ':'.join(['tagged', *map(str, parts), digest.hexdigest()])
+
+
+class TaggedQuerySet(models.QuerySet):
+    """QuerySet whose ``update()`` bumps the tags of the rows it changes.
+
+    Tags are read from the rows before the UPDATE unless the caller already
+    knows them and passes ``_tags`` (see ``tags_from_values``). An update
+    that moves rows to another parent (``update(car=...)``) must also bump
+    the new parent's tags with ``bump_tags``.
+    """
+
+    def update(self, _tags=None, **kwargs):
+        tags = tags_for_queryset(self) if _tags is None else _tags
+        updated = super().update(**kwargs)
+        if updated:
+            bump_tags(tags)
+        return updated
+
+
+class CacheTagsMixin:
+    """Declare the tags a view's cached data depends on.
+
+    ``cache_tags`` templates are filled from the URL kwargs, e.g.
+    ``cache_tags = ('car:{pk}', 'browse')``; override ``get_cache_tags``
+    for tags that depend on the request.
+    """
+    cache_tags = ()
+
+    def get_cache_tags(self):
+        return [template.format_map(self.kwargs) for template in self.cache_tags]
+
+    def cache_key(self, *parts):
+        return tagged_key(self.get_cache_tags(), type(self).__name__, *parts)
+
+
+def _identity(value):
+    if isinstance(value, models.Model):
+        return f'{value._meta.label}:{value.pk}'
+    return value
+
+
+def cached_by_tags(*templates, timeout=300):
+    """Cache a function's result per arguments until one of its tags is bumped.
+
+    Templates are filled from the call arguments, e.g.
+    ``@cached_by_tags('car:{car.pk}')`` on ``def card(car)``.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            bound = signature.bind(*args, **kwargs)
+            bound.apply_defaults()
+            key = tagged_key(
+                [template.format_map(bound.arguments) for template in templates],
+                func.__module__, func.__qualname__,
+                params_digest({name: _identity(value) for name, value in bound.arguments.items()})
+            )
+            return get_or_compute(key, lambda: func(*args, **kwargs), timeout)
+        return wrapper
+    return decorator
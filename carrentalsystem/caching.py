@@ -0,0 +1,88 @@
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+
+
+def _version_key(namespace):
+    return f'version:{namespace}'
+
+
+def _fresh_version():
+    # Time based, so a version key lost to eviction never restarts at a value still used by old entries
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """Current version of a cache namespace such as ``owner:12``"""
+    version = cache.get(_version_key(namespace))
+    if version is None:
+        cache.add(_version_key(namespace), _fresh_version(), None)
+        version = cache.get(_version_key(namespace), _fresh_version())
+    return version
+
+
+def get_versions(namespaces):
+    """{namespace: version} of several namespaces in one cache round trip"""
+    keys = {_version_key(namespace): namespace for namespace in namespaces}
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh_version(), None)
+        found.update(cache.get_many(missing))
+    return {namespace: found.get(key) or _fresh_version() for key, namespace in keys.items()}
+
+
+def bump_version(namespace):
+    """Invalidate every key built with ``versioned_key(namespace, ...)``"""
+    try:
+        return cache.incr(_version_key(namespace))
+    except ValueError:
+        version = _fresh_version()
+        cache.set(_version_key(namespace), version, None)
+        return version
+
+
+def versioned_key(namespace, *parts):
+    return ':'.join([namespace, f'v{get_version(namespace)}', *map(str, parts)])
+
+
+def params_digest(params):
+    """Short stable digest of a filter dict: empty values dropped, key order ignored"""
+    normalized = json.dumps(
+        {name: str(value) for name, value in params.items() if value not in (None, '', [])},
+        sort_keys=True
+    )
+    return hashlib.md5(normalized.encode()).hexdigest()
+
+
+def get_or_compute(key, compute, timeout, lock_timeout=30, wait=5.0, poll=0.05):
+    """Cached value of ``key``, computing it at most once at a time across workers.
+
+    On a miss the caller that wins ``cache.add`` on the lock key runs
+    ``compute``; the others poll for its result for up to ``wait`` seconds
+    before computing it themselves (without caching), so a stuck holder
+    delays requests but never fails them.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    lock_key = f'lock:{key}'
+    if cache.add(lock_key, 1, lock_timeout):
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            cache.delete(lock_key)
+        return value
+
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        time.sleep(poll)
+        value = cache.get(key)
+        if value is not None:
+            return value
+    return compute()
@@ -0,0 +1,75 @@
+"""Conditional GET for pages whose data is tracked by cache tags.
+
+The ETag is built from the versions of the page's cache tags (see
+``carrentalsystem.cache_tags``), the viewer and the URL; Last-Modified
+from the view's ``get_last_modified``. When the client's validators still
+match, a 304 is returned before the view's queries and the template run.
+
+Anonymous responses are marked ``public`` with ``s-maxage`` so the nginx
+micro-cache can serve them for ``MICRO_CACHE_SECONDS``; everything else is
+``private, no-cache`` and revalidated on every use.
+"""
+import hashlib
+
+from django.conf import settings
+from django.contrib import messages
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+from .cache_tags import CacheTagsMixin, tag_versions
+
+
+class ConditionalGetMixin(CacheTagsMixin):
+    """Answer GET with 304 Not Modified while ``cache_tags`` and ``get_last_modified`` are unchanged"""
+
+    def get_last_modified(self):
+        """Newest change to the page's data; None disables the validators (e.g. for a 404)"""
+        return None
+
+    def get_etag(self, last_modified):
+        user = self.request.user
+        viewer = user.pk if user.is_authenticated else 'anonymous'
+        versions = tag_versions(self.get_cache_tags())
+        parts = [
+            type(self).__name__, self.request.get_full_path(), str(viewer), last_modified.isoformat(),
+            *(f'{tag}={version}' for tag, version in versions.items()),
+        ]
+        return quote_etag(hashlib.md5('\n'.join(parts).encode()).hexdigest())
+
+    def get(self, request, *args, **kwargs):
+        # Flash messages only show in a full render, and must not be cached
+        if len(messages.get_messages(request)):
+            response = super().get(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_store=True)
+            return response
+
+        last_modified = self.get_last_modified()
+        if last_modified is None:
+            response = super().get(request, *args, **kwargs)
+        else:
+            etag = self.get_etag(last_modified)
+            timestamp = int(last_modified.timestamp())
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = super().get(request, *args, **kwargs)
+            response.headers.setdefault('ETag', etag)
+            response.headers.setdefault('Last-Modified', http_date(timestamp))
+
+        if getattr(response, 'is_rendered', True):
+            self.patch_cache_headers(response)
+        else:
+            # Whether the template emitted a CSRF token is only known after rendering
+            response.add_post_render_callback(self.patch_cache_headers)
+        return response
+
+    def patch_cache_headers(self, response):
+        shared = (
+            not self.request.user.is_authenticated
+            # A page carrying a CSRF token belongs to the visitor whose cookie it matches
+            and not self.request.META.get('CSRF_COOKIE_NEEDS_UPDATE')
+            and response.status_code in (200, 304)
+        )
+        if shared:
+            patch_cache_control(response, public=True, max_age=0, s_maxage=getattr(settings, 'MICRO_CACHE_SECONDS', 5))
+        else:
+            patch_cache_control(response, private=True, no_cache=True)
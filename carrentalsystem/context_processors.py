@@ -1,4 +1,5 @@
 from django.conf import settings
+from users.profiles import lazy_profile
 
 def site_settings(request):
     """Add site-wide settings to template context"""
@@ -11,8 +12,5 @@ def site_settings(request):
     }
 
 def user_context(request):
-    """Add user-related context"""
-    context = {}
-    if request.user.is_authenticated:
-        context['user_profile'] = getattr(request.user, 'customer_profile', None) or getattr(request.user, 'owner_profile', None)
-    return context
\ No newline at end of file
+    """Add user-related context; the profile is only looked up if a template uses it"""
+    return {'user_profile': lazy_profile(request)}
\ No newline at end of file
@@ -0,0 +1,185 @@
+import base64
+import datetime
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    """Opaque URL-safe token for a position in a keyset-ordered list"""
+    # Full isoformat: DjangoJSONEncoder drops microseconds, which would skip rows
+    values = [value.isoformat() if isinstance(value, (datetime.date, datetime.time)) else value for value in values]
+    payload = json.dumps({'v': values, 'b': backwards}, cls=DjangoJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(payload)
+        return list(data['v']), bool(data['b'])
+    except (ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+
+
+class CursorPage:
+    """One page of a CursorPaginator, shaped like Django's Page where it can be"""
+
+    def __init__(self, object_list, paginator, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.next_link = self.previous_link = None
+
+    def __repr__(self):
+        return f'<CursorPage of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+    def build_links(self, query, cursor_param, page_param):
+        """Set next_link/previous_link, keeping every other query parameter"""
+        for attr, cursor in (('next_link', self.next_cursor), ('previous_link', self.previous_cursor)):
+            if cursor is None:
+                continue
+            params = query.copy()
+            params.pop(page_param, None)
+            params[cursor_param] = cursor
+            setattr(self, attr, f'?{params.urlencode()}')
+
+
+class CursorPaginator:
+    """Keyset paginator: each page is one indexed range read, however deep.
+
+    ``ordering`` must end in a unique field (normally ``-id``) so every row
+    has a distinct position. Pages hold no total; ``approximate_count`` is
+    a capped COUNT that callers can ask for when they want to show one.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id'), count_limit=1000):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.model_fields = {field.name for field in queryset.model._meta.concrete_fields} | {'pk'}
+        self.count_limit = count_limit
+
+    def page(self, cursor=None):
+        backwards = False
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            values, backwards = decode_cursor(cursor)
+            queryset = queryset.filter(self.after(values, backwards))
+            if backwards:
+                queryset = queryset.reverse()
+
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+
+        if not rows:
+            return CursorPage(rows, self, None, None)
+        has_next = has_more if not backwards else True
+        has_previous = bool(cursor) if not backwards else has_more
+        return CursorPage(
+            rows,
+            self,
+            encode_cursor(self.position(rows[-1])) if has_next else None,
+            encode_cursor(self.position(rows[0]), backwards=True) if has_previous else None,
+        )
+
+    def position(self, obj):
+        return [getattr(obj, name) for name in self.fields]
+
+    def after(self, values, backwards):
+        """Rows strictly after ``values`` in the ordering (before it when ``backwards``)"""
+        if len(values) != len(self.fields):
+            raise InvalidCursor(values)
+        opts = self.queryset.model._meta
+        try:
+            # Annotations (a search rank, say) keep their JSON value
+            values = [
+                opts.get_field(name).to_python(value) if name in self.model_fields else value
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(values)
+
+        condition = Q()
+        for depth, name in enumerate(self.ordering):
+            field = self.fields[depth]
+            descending = name.startswith('-')
+            lookup = 'lt' if descending != backwards else 'gt'
+            tie = Q(**dict(zip(self.fields[:depth], values[:depth])))
+            condition |= tie & Q(**{f'{field}__{lookup}': values[depth]})
+        return condition
+
+    @cached_property
+    def approximate_count(self):
+        """Number of rows, stopping at ``count_limit + 1`` so the count stays cheap"""
+        return self.queryset.order_by()[:self.count_limit + 1].count()
+
+    @property
+    def count_is_capped(self):
+        return self.approximate_count > self.count_limit
+
+
+class CursorPaginationMixin:
+    """Keyset pagination for ListView; ``?page=N`` and plain lists keep the offset paginator.
+
+    The page is exposed as ``page_obj`` and ``cursor_page``. ``is_paginated``
+    stays False in cursor mode, so page-number templates render nothing
+    and the cursor links are drawn by ``partials/cursor_pagination.html``.
+    """
+    cursor_ordering = ('-created_at', '-id')
+    cursor_param = 'cursor'
+
+    def paginate_queryset(self, queryset, page_size):
+        # Already materialized lists (a distance-sorted result, say) page in memory
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, page_size)
+        if self.page_kwarg in self.request.GET or self.page_kwarg in self.kwargs:
+            # Page numbers walk the same order as the cursors
+            return super().paginate_queryset(queryset.order_by(*self.get_cursor_ordering()), page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_param))
+        except InvalidCursor:
+            raise Http404('Invalid cursor.')
+        page.build_links(self.request.GET, self.cursor_param, self.page_kwarg)
+        return (paginator, page, page.object_list, False)
+
+    def get_cursor_ordering(self):
+        return self.cursor_ordering
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        page = context.get('page_obj')
+        context['cursor_page'] = page if isinstance(page, CursorPage) else None
+        return context
@@ -93,11 +93,28 @@ WSGI_APPLICATION = 'carrentalsystem.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Processes sharing the database (web, send_queued_emails) must point at the same file
+        'NAME': config('SQLITE_PATH', default=str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {
+            # Take the write lock at BEGIN so concurrent bookings queue up instead of failing
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
+        # A file rather than Django's default shared-cache in-memory database: threads
+        # sharing a memory database take table locks that fail at once with "database
+        # table is locked" instead of waiting out `timeout`, so the concurrent booking
+        # test (bookings.tests) could not queue on the write lock the way production does
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
     }
 }
 
 
+# Local cache, temporary media and inline image variants for every test
+TEST_RUNNER = 'carrentalsystem.testing.TestRunner'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -229,13 +246,28 @@ LOGGING = {
     },
 }
 
-# Cache configuration (development - using local memory cache)
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
+# Cache configuration: every worker process must share one cache, or the
+# versioned keys of carrentalsystem.caching go stale in the other workers.
+# Redis when REDIS_URL is set, otherwise a SQLite file on local disk.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'KEY_PREFIX': 'carrental',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'carrentalsystem.cache_backends.SQLiteCache',
+            'LOCATION': config('CACHE_SQLITE_PATH', default=str(BASE_DIR / 'cache.sqlite3')),
+            'OPTIONS': {
+                'MAX_ENTRIES': 50000,
+            },
+        }
     }
-}
 
 # Session configuration
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'  # Using database for sessions
@@ -249,4 +281,17 @@ SITE_NAME = 'DriveRental'
 SITE_DESCRIPTION = 'Your trusted car rental platform'
 SUPPORT_EMAIL = 'support@driverental.com'
 SUPPORT_PHONE = '+1-555-123-4567'
-COMPANY_ADDRESS = '123 Rental Street, City, State 12345'
\ No newline at end of file
+COMPANY_ADDRESS = '123 Rental Street, City, State 12345'
+
+# Availability interval index (rentals.availability)
+AVAILABILITY_INDEX_TTL = 60  # Seconds before a car's intervals are reloaded from the database
+AVAILABILITY_INDEX_VERIFY = DEBUG  # Cross-check every answer against the ORM query
+
+OWNER_STATS_CACHE_TIMEOUT = 300  # Seconds the owner dashboard counters are cached
+BROWSE_FACETS_CACHE_TIMEOUT = 120  # Seconds facet counts are cached per filter set
+BROWSE_RESULTS_CACHE_TIMEOUT = 60  # Seconds a browse page (car ids and total) is cached
+PROFILE_SESSION_CACHE_TIMEOUT = 300  # Seconds the user's profile ids are remembered in the session
+MICRO_CACHE_SECONDS = 5  # Seconds nginx may serve an anonymous car page from its cache
+CAR_CARD_CACHE_TIMEOUT = 3600  # Seconds a rendered car card is cached (rentals.templatetags.car_cards)
+CACHE_TAGS_ROW_LIMIT = 100  # Rows an UPDATE bumps cache tags for one by one; beyond that the model-wide tags (carrentalsystem.cache_tags)
+IMAGE_VARIANT_WORKERS = 2  # Processes resizing uploaded car photos; 0 resizes in the request (rentals.images)
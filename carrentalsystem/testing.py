@@ -0,0 +1,54 @@
+"""Test runner and fixtures shared by the apps' tests.
+
+``TestRunner`` (the ``TEST_RUNNER`` setting) runs every test, including
+TransactionTestCases whose on-commit hooks do fire, with a per-process
+cache, a temporary ``MEDIA_ROOT`` and image variants rendered inline, so
+no test writes ``cache.sqlite3`` or ``media/`` in the checkout or leaves a
+process pool of image workers behind.
+"""
+import io
+import tempfile
+
+from django.core.files.base import ContentFile
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+from django.utils import timezone
+from PIL import Image
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.media_root = tempfile.TemporaryDirectory()
+        self.test_settings = override_settings(
+            CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}},
+            MEDIA_ROOT=self.media_root.name,
+            IMAGE_VARIANT_WORKERS=0,
+        )
+        self.test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.test_settings.disable()
+        self.media_root.cleanup()
+        super().teardown_test_environment(**kwargs)
+
+
+def image_file(width=64, height=48, name='car.png'):
+    """A real PNG to assign to an image field"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), (200, 30, 30)).save(buffer, 'PNG')
+    return ContentFile(buffer.getvalue(), name=name)
+
+
+def make_car(owner_user, **kwargs):
+    """A car listed by a new owner profile of ``owner_user``, with a real photo"""
+    from rentals.models import Car
+    from users.models import CarOwner
+
+    values = {
+        'make': 'Toyota', 'model': 'Corolla', 'year': timezone.now().year, 'car_type': 'sedan',
+        'daily_rate': 50, 'license_plate': f'TEST-{owner_user.pk}', 'pickup_location': 'Depot',
+        'city': 'Springfield', 'image': image_file(),
+    }
+    values.update(kwargs)
+    return Car.objects.create(owner=CarOwner.objects.create(user=owner_user), **values)
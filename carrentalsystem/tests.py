@@ -0,0 +1,29 @@
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from .cache_backends import SQLiteCache
+
+
+class SQLiteCacheTests(SimpleTestCase):
+    def make_cache(self, **options):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        return SQLiteCache(os.path.join(directory.name, 'cache.sqlite3'), {'OPTIONS': options})
+
+    def count(self, cache):
+        return cache.db.execute('SELECT COUNT(*) FROM cache_entry').fetchone()[0]
+
+    def test_culls_once_per_interval(self):
+        cache = self.make_cache(MAX_ENTRIES=10, CULL_FREQUENCY=2, CULL_INTERVAL=20)
+        cache.set_many({f'key{i}': i for i in range(19)})
+        self.assertEqual(self.count(cache), 19)
+        cache.set('key19', 19)
+        self.assertEqual(self.count(cache), 10)
+
+    def test_entries_without_expiry_are_culled_last(self):
+        cache = self.make_cache(MAX_ENTRIES=2, CULL_FREQUENCY=3, CULL_INTERVAL=1)
+        cache.set('version', 1, None)
+        cache.set_many({'a': 1, 'b': 2})
+        self.assertEqual(cache.get('version'), 1)
@@ -0,0 +1,59 @@
+import copy
+
+
+class FieldTrackerMixin:
+    """Model mixin remembering the stored values of ``tracked_fields``.
+
+    Values are captured when an instance is loaded (``from_db``), refreshed
+    or saved, so code reacting to a change (for example a status
+    transition) can compare against the stored value without reading the
+    row again. Instances built in Python have no snapshot; for those, and
+    for deferred fields, the stored value is read from the database.
+    """
+    tracked_fields = ()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.snapshot_tracked_fields()
+        return instance
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        self.snapshot_tracked_fields(fields)
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.snapshot_tracked_fields(kwargs.get('update_fields'))
+
+    def snapshot_tracked_fields(self, fields=None):
+        """Record current values; with ``fields``, only those just read from the database"""
+        loaded = getattr(self, '_loaded_values', None) if fields is not None else None
+        if loaded is None:
+            loaded = {}
+        for name in self.tracked_fields:
+            field = self._meta.get_field(name)
+            if fields is not None and name not in fields and field.attname not in fields:
+                continue
+            if field.attname in self.__dict__:
+                # Copied, so in-place edits of lists and dicts (JSONField values) still count as changes
+                loaded[name] = copy.deepcopy(self.__dict__[field.attname])
+        self._loaded_values = loaded
+
+    def get_loaded_value(self, name):
+        """Return the value of ``name`` as last read from or written to the database"""
+        if self._state.adding:
+            return None
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None or name not in loaded:
+            attname = self._meta.get_field(name).attname
+            value = type(self)._base_manager.filter(pk=self.pk).values_list(attname, flat=True).first()
+            if loaded is not None:
+                loaded[name] = value
+            return value
+        return loaded[name]
+
+    def has_changed(self, name):
+        if self._state.adding:
+            return True
+        return self.get_loaded_value(name) != getattr(self, self._meta.get_field(name).attname)
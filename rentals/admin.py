@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Car, Rental, Review, CarImage
+from .models import Car, Rental, Review, CarImage, CarOccupancy, OwnerMonthlyStats, CarFeature
 
 @admin.register(Car)
 class CarAdmin(admin.ModelAdmin):
@@ -7,7 +7,7 @@ class CarAdmin(admin.ModelAdmin):
     list_filter = ('car_type', 'fuel_type', 'transmission', 'is_available', 'is_active', 'created_at')
     search_fields = ('make', 'model', 'license_plate', 'city')
     list_editable = ('is_available', 'daily_rate')
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('created_at', 'updated_at', 'rating_sum', 'rating_count', 'avg_rating', 'image_variants')
     raw_id_fields = ('owner',)
 
 @admin.register(Rental)
@@ -31,4 +31,25 @@ class CarImageAdmin(admin.ModelAdmin):
     list_display = ('car', 'is_primary', 'created_at')
     list_filter = ('is_primary', 'created_at')
     search_fields = ('car__make', 'car__model')
-    raw_id_fields = ('car',)
\ No newline at end of file
+    readonly_fields = ('image_variants',)
+    raw_id_fields = ('car',)
+
+@admin.register(CarOccupancy)
+class CarOccupancyAdmin(admin.ModelAdmin):
+    list_display = ('car', 'start_date', 'end_date', 'source', 'source_id', 'status')
+    list_filter = ('source', 'status', 'start_date')
+    search_fields = ('car__make', 'car__model', 'car__license_plate')
+    raw_id_fields = ('car',)
+
+@admin.register(OwnerMonthlyStats)
+class OwnerMonthlyStatsAdmin(admin.ModelAdmin):
+    list_display = ('owner', 'month', 'bookings', 'revenue', 'rating_count')
+    list_filter = ('month',)
+    search_fields = ('owner__user__username', 'owner__company_name')
+    raw_id_fields = ('owner',)
+
+@admin.register(CarFeature)
+class CarFeatureAdmin(admin.ModelAdmin):
+    list_display = ('name', 'car')
+    search_fields = ('name', 'car__make', 'car__model')
+    raw_id_fields = ('car',)
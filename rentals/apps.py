@@ -1,5 +1,15 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+def create_search_index(sender, using=None, **kwargs):
+    """The full-text index lives outside the models, so migrate cannot create it"""
+    from .search import ensure_search_index
+    ensure_search_index(using)
 
 class RentalsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rentals'
+    
+    def ready(self):
+        import rentals.signals
+        post_migrate.connect(create_search_index, sender=self)
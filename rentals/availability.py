@@ -0,0 +1,175 @@
+import bisect
+import logging
+import threading
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Reservation statuses that block a car for their date range
+BLOCKING_STATUSES = ['pending', 'confirmed', 'active']
+
+
+
+class CarIntervals:
+    """Blocking reservations of one car, sorted by start date.
+
+    Reservations of the same car may overlap each other (several pending
+    requests for the same week), so ``max_ends[i]`` keeps the latest end date
+    among the first ``i + 1`` intervals. An overlap query is then one bisect
+    on the start dates plus one lookup.
+    """
+
+    __slots__ = ('starts', 'ends', 'keys', 'max_ends', 'loaded_at')
+
+    def __init__(self, rows=()):
+        rows = sorted(rows)
+        self.starts = [row[0] for row in rows]
+        self.ends = [row[1] for row in rows]
+        self.keys = [row[2] for row in rows]
+        self.loaded_at = time.monotonic()
+        self._rebuild_max_ends()
+
+    def __len__(self):
+        return len(self.starts)
+
+    def _rebuild_max_ends(self, position=0):
+        max_ends = self.max_ends[:position] if position else []
+        latest = max_ends[-1] if max_ends else None
+        for end in self.ends[position:]:
+            latest = end if latest is None or end > latest else latest
+            max_ends.append(latest)
+        self.max_ends = max_ends
+
+    def overlaps(self, start_date, end_date):
+        """Return True if any interval satisfies ``start < end_date`` and ``end > start_date``"""
+        position = bisect.bisect_left(self.starts, end_date)
+        if position == 0:
+            return False
+        return self.max_ends[position - 1] > start_date
+
+    def add(self, start_date, end_date, key):
+        self.remove(key)
+        position = bisect.bisect_right(self.starts, start_date)
+        self.starts.insert(position, start_date)
+        self.ends.insert(position, end_date)
+        self.keys.insert(position, key)
+        self._rebuild_max_ends(position)
+
+    def remove(self, key):
+        try:
+            position = self.keys.index(key)
+        except ValueError:
+            return False
+        del self.starts[position]
+        del self.ends[position]
+        del self.keys[position]
+        self._rebuild_max_ends(position)
+        return True
+
+
+class ReservationIndex:
+    """Process-local, lazily loaded interval index per car.
+
+    Entries are loaded from the ``CarOccupancy`` ledger on first use and kept
+    current by the ledger's write path, which covers both rentals and
+    bookings. Writes made by other processes (other gunicorn workers,
+    management commands) are not seen here, so every entry is reloaded once
+    it is older than ``AVAILABILITY_INDEX_TTL`` seconds. When
+    ``AVAILABILITY_INDEX_VERIFY`` is on, each answer is compared with the ORM
+    query and the ORM wins on a mismatch.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_TTL', 60)
+
+    @property
+    def verify(self):
+        return getattr(settings, 'AVAILABILITY_INDEX_VERIFY', settings.DEBUG)
+
+    def blocking_queryset(self, car_id):
+        CarOccupancy = apps.get_model('rentals', 'CarOccupancy')
+        return CarOccupancy.objects.filter(car_id=car_id, status__in=BLOCKING_STATUSES)
+
+    def _load(self, car_id):
+        rows = self.blocking_queryset(car_id).order_by().values_list('start_date', 'end_date', 'source', 'source_id')
+        entry = CarIntervals((start, end, (source, source_id)) for start, end, source, source_id in rows)
+        with self._lock:
+            self._entries[car_id] = entry
+        return entry
+
+    def get_entry(self, car_id):
+        entry = self._entries.get(car_id)
+        if entry is None or time.monotonic() - entry.loaded_at > self.ttl:
+            entry = self._load(car_id)
+        return entry
+
+    def has_overlap_in_db(self, car_id, start_date, end_date):
+        """ORM fallback, also used to verify the in-memory answer"""
+        return self.blocking_queryset(car_id).filter(
+            start_date__lt=end_date,
+            end_date__gt=start_date
+        ).exists()
+
+    def has_overlap(self, car_id, start_date, end_date):
+        try:
+            overlaps = self.get_entry(car_id).overlaps(start_date, end_date)
+        except Exception as e:
+            logger.error(f"Interval index lookup failed for car #{car_id}: {str(e)}")
+            return self.has_overlap_in_db(car_id, start_date, end_date)
+
+        if self.verify:
+            expected = self.has_overlap_in_db(car_id, start_date, end_date)
+            if expected != overlaps:
+                logger.warning(
+                    f"Interval index out of date for car #{car_id} "
+                    f"({start_date} - {end_date}), reloading"
+                )
+                self.invalidate(car_id)
+                return expected
+        return overlaps
+
+    def is_available(self, car_id, start_date, end_date):
+        return not self.has_overlap(car_id, start_date, end_date)
+
+    def record(self, car_id, key, start_date, end_date, status):
+        """Apply a ledger write to the loaded entry of its car, if any"""
+        with self._lock:
+            entry = self._entries.get(car_id)
+            if entry is None:
+                return
+            if status in BLOCKING_STATUSES:
+                entry.add(start_date, end_date, key)
+            else:
+                entry.remove(key)
+
+    def discard(self, car_id, key):
+        with self._lock:
+            entry = self._entries.get(car_id)
+            if entry is not None:
+                entry.remove(key)
+
+    def invalidate(self, car_id=None):
+        with self._lock:
+            if car_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(car_id, None)
+
+    def record_on_commit(self, car_id, key, start_date, end_date, status):
+        """Applied only once the surrounding transaction commits"""
+        transaction.on_commit(lambda: self.record(car_id, key, start_date, end_date, status))
+
+    def discard_on_commit(self, car_id, key):
+        transaction.on_commit(lambda: self.discard(car_id, key))
+
+
+reservation_index = ReservationIndex()
@@ -0,0 +1,102 @@
+"""Result counts for the browse sidebar filters.
+
+All facets come from one GROUP BY over the filtered queryset: each row is
+a distinct (car_type, fuel_type, transmission, seats bucket, price bucket,
+city) combination with its count, and the per-facet totals are summed from
+those rows in Python. Results are cached per normalized filter set under
+the browse cache tags (see ``browse_cache_key``).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, Value, When
+
+from carrentalsystem.cache_tags import tagged_key
+from carrentalsystem.caching import params_digest
+from .models import Car
+
+# (value, label, lookup) of each bucket
+SEAT_BUCKETS = [
+    ('1', '1-2 seats', Q(seats__lte=2)),
+    ('3', '3-4 seats', Q(seats__gte=3, seats__lte=4)),
+    ('5', '5 seats', Q(seats=5)),
+    ('6', '6-7 seats', Q(seats__gte=6, seats__lte=7)),
+    ('8', '8+ seats', Q(seats__gte=8)),
+]
+PRICE_BUCKETS = [
+    ('0-50', 'Under $50', Q(daily_rate__lt=50)),
+    ('50-100', '$50 - $100', Q(daily_rate__gte=50, daily_rate__lt=100)),
+    ('100-200', '$100 - $200', Q(daily_rate__gte=100, daily_rate__lt=200)),
+    ('200-', '$200+', Q(daily_rate__gte=200)),
+]
+CHOICE_FACETS = {
+    'car_type': dict(Car.CAR_TYPES),
+    'fuel_type': dict(Car.FUEL_TYPES),
+    'transmission': dict(Car.TRANSMISSION_TYPES),
+}
+BUCKET_FACETS = {
+    'seats': SEAT_BUCKETS,
+    'price': PRICE_BUCKETS,
+}
+
+
+def bucket(buckets):
+    return Case(
+        *[When(lookup, then=Value(value)) for value, _, lookup in buckets],
+        default=Value(''),
+        output_field=CharField()
+    )
+
+
+def browse_cache_key(kind, params, *parts):
+    """Cache key for browse data computed from the search filters ``params``.
+
+    Every key is tagged ``browse`` (bumped by Car changes); keys of
+    date-range searches are also tagged ``occupancy``, since reservations
+    decide which cars those return.
+    """
+    tags = ['browse', 'occupancy'] if params.get('start_date') else ['browse']
+    return tagged_key(tags, 'browse', kind, params_digest(params), *parts)
+
+
+def facet_counts(queryset, params):
+    """{facet: [{'value', 'label', 'count'}]} for the cars in ``queryset``.
+
+    ``params`` is what produced the queryset (cleaned search form data) and
+    only serves as the cache key.
+    """
+    key = browse_cache_key('facets', params)
+    facets = cache.get(key)
+    if facets is not None:
+        return facets
+
+    rows = (
+        queryset.order_by()
+        .annotate(seats_bucket=bucket(SEAT_BUCKETS), price_bucket=bucket(PRICE_BUCKETS))
+        .values('car_type', 'fuel_type', 'transmission', 'seats_bucket', 'price_bucket', 'city')
+        .annotate(count=Count('id'))
+    )
+    totals = {name: {} for name in [*CHOICE_FACETS, *BUCKET_FACETS, 'city']}
+    columns = {'seats': 'seats_bucket', 'price': 'price_bucket'}
+    for row in rows:
+        for name, counts in totals.items():
+            value = row[columns.get(name, name)]
+            counts[value] = counts.get(value, 0) + row['count']
+
+    facets = {}
+    for name, labels in CHOICE_FACETS.items():
+        facets[name] = [
+            {'value': value, 'label': label, 'count': totals[name].get(value, 0)}
+            for value, label in labels.items()
+        ]
+    for name, buckets in BUCKET_FACETS.items():
+        facets[name] = [
+            {'value': value, 'label': label, 'count': totals[name].get(value, 0)}
+            for value, label, _ in buckets
+        ]
+    facets['city'] = [
+        {'value': city, 'label': city, 'count': count}
+        for city, count in sorted(totals['city'].items(), key=lambda item: (-item[1], item[0]))
+    ]
+
+    cache.set(key, facets, getattr(settings, 'BROWSE_FACETS_CACHE_TIMEOUT', 120))
+    return facets
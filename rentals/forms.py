@@ -1,7 +1,10 @@
 from django import forms
 from django.core.exceptions import ValidationError
+from django.db.models import Exists, OuterRef
 from django.utils import timezone
-from .models import Car, Rental, Review
+from .models import Car, CarFeature, CarOccupancy, Rental, Review
+from .availability import BLOCKING_STATUSES
+from .search import search_cars
 
 class CarForm(forms.ModelForm):
     class Meta:
@@ -83,6 +86,11 @@ class ReviewForm(forms.ModelForm):
         }
 
 class CarSearchForm(forms.Form):
+    q = forms.CharField(
+        required=False,
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Search make, model, city, features...'})
+    )
     car_type = forms.ChoiceField(
         choices=[('', 'All Types')] + Car.CAR_TYPES,
         required=False,
@@ -119,4 +127,119 @@ class CarSearchForm(forms.Form):
     city = forms.CharField(
         required=False,
         widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'City'})
-    )
\ No newline at end of file
+    )
+    start_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    end_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    features = forms.CharField(
+        required=False,
+        max_length=300,
+        widget=forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Features, e.g. GPS, Bluetooth'})
+    )
+    features_match = forms.ChoiceField(
+        choices=[('all', 'All of these'), ('any', 'Any of these')],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'})
+    )
+    lat = forms.FloatField(required=False, min_value=-90, max_value=90, widget=forms.HiddenInput)
+    lng = forms.FloatField(required=False, min_value=-180, max_value=180, widget=forms.HiddenInput)
+    radius = forms.FloatField(
+        required=False,
+        min_value=0.1,
+        max_value=500,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'placeholder': 'Within km'})
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        
+        if bool(start_date) != bool(end_date):
+            raise ValidationError("Please select both a pick-up and a return date.")
+        if start_date and end_date and start_date >= end_date:
+            raise ValidationError("End date must be after start date.")
+        if (cleaned_data.get('lat') is None) != (cleaned_data.get('lng') is None):
+            raise ValidationError("Location needs both a latitude and a longitude.")
+        if cleaned_data.get('radius') and cleaned_data.get('lat') is None:
+            raise ValidationError("Please share your location to search within a radius.")
+        
+        return cleaned_data
+    
+    @property
+    def location(self):
+        """(lat, lng) of a valid location search, else None"""
+        if self.cleaned_data.get('lat') is None:
+            return None
+        return self.cleaned_data['lat'], self.cleaned_data['lng']
+    
+    def filter_queryset(self, queryset):
+        """Apply the cleaned search filters to a Car queryset.
+        
+        Without a date range only cars flagged ``is_available`` are kept. With
+        one, availability is decided per range instead: cars with a blocking
+        booking or rental overlapping it are excluded by a correlated NOT EXISTS
+        on the occupancy ledger, so a car booked next week still shows up for
+        today. The other filters are those of ``filter_attributes``.
+        """
+        start_date = self.cleaned_data.get('start_date')
+        end_date = self.cleaned_data.get('end_date')
+        
+        queryset = self.filter_attributes(queryset)
+        if start_date and end_date:
+            return queryset.exclude(Exists(self.overlapping(start_date, end_date)))
+        return queryset.filter(is_available=True)
+    
+    def filter_attributes(self, queryset):
+        """Apply every filter except availability (the date range and ``is_available``).
+        
+        Free text in ``q`` goes through the full-text index and adds a
+        ``search_rank`` annotation.
+        """
+        q = self.cleaned_data.get('q')
+        car_type = self.cleaned_data.get('car_type')
+        fuel_type = self.cleaned_data.get('fuel_type')
+        transmission = self.cleaned_data.get('transmission')
+        min_price = self.cleaned_data.get('min_price')
+        max_price = self.cleaned_data.get('max_price')
+        seats = self.cleaned_data.get('seats')
+        city = self.cleaned_data.get('city')
+        features = self.cleaned_data.get('features')
+        
+        if q:
+            queryset = search_cars(queryset, q)
+        if car_type:
+            queryset = queryset.filter(car_type=car_type)
+        if fuel_type:
+            queryset = queryset.filter(fuel_type=fuel_type)
+        if transmission:
+            queryset = queryset.filter(transmission=transmission)
+        if min_price:
+            queryset = queryset.filter(daily_rate__gte=min_price)
+        if max_price:
+            queryset = queryset.filter(daily_rate__lte=max_price)
+        if seats:
+            queryset = queryset.filter(seats__gte=seats)
+        if city:
+            queryset = queryset.filter(city__icontains=city)
+        if features:
+            queryset = CarFeature.filter_cars(
+                queryset, features.split(','), match_all=self.cleaned_data.get('features_match') != 'any'
+            )
+        
+        return queryset
+    
+    @staticmethod
+    def overlapping(start_date, end_date):
+        """Blocking ledger rows of the outer car that overlap the date range"""
+        return CarOccupancy.objects.filter(
+            car=OuterRef('pk'),
+            status__in=BLOCKING_STATUSES,
+            start_date__lt=end_date,
+            end_date__gt=start_date
+        )
\ No newline at end of file
@@ -0,0 +1,89 @@
+"""Distance search over Car.latitude/longitude without a GIS backend.
+
+Candidates come from a bounding-box range read on the (latitude,
+longitude) index; exact great-circle distances are then computed for the
+candidates only, in one pass, and sorted.
+"""
+import math
+
+from django.db.models import Q
+
+EARTH_RADIUS_KM = 6371.0088
+# Half the circumference: no two points on Earth are further apart
+MAX_DISTANCE_KM = math.pi * EARTH_RADIUS_KM
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """Q matching every point within ``radius_km`` of (latitude, longitude), and a few more"""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = latitude - lat_delta, latitude + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        # The circle covers a pole, so every longitude qualifies
+        return Q(latitude__gte=max(min_lat, -90), latitude__lte=min(max_lat, 90))
+
+    # Widest longitude span of the circle, at its tangent latitude
+    ratio = math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))
+    if radius_km / EARTH_RADIUS_KM >= math.pi / 2 or ratio >= 1:
+        return Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    lng_delta = math.degrees(math.asin(ratio))
+    min_lng, max_lng = longitude - lng_delta, longitude + lng_delta
+    box = Q(latitude__gte=min_lat, latitude__lte=max_lat)
+    if min_lng < -180:
+        return box & (Q(longitude__gte=min_lng + 360) | Q(longitude__lte=max_lng))
+    if max_lng > 180:
+        return box & (Q(longitude__gte=min_lng) | Q(longitude__lte=max_lng - 360))
+    return box & Q(longitude__gte=min_lng, longitude__lte=max_lng)
+
+
+def distances_km(latitude, longitude, points):
+    """Haversine distance from the origin to every (latitude, longitude) in ``points``"""
+    lat0 = math.radians(latitude)
+    lng0 = math.radians(longitude)
+    cos_lat0 = math.cos(lat0)
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    result = []
+    for lat, lng in points:
+        lat, lng = radians(lat), radians(lng)
+        h = sin((lat - lat0) / 2) ** 2 + cos_lat0 * cos(lat) * sin((lng - lng0) / 2) ** 2
+        result.append(2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(h))))
+    return result
+
+
+def within(queryset, latitude, longitude, radius_km):
+    """[(distance_km, car_id)] of the cars within ``radius_km``, nearest first"""
+    rows = list(
+        queryset.filter(bounding_box(latitude, longitude, radius_km))
+        .order_by()
+        .values_list('id', 'latitude', 'longitude')
+    )
+    distances = distances_km(latitude, longitude, ((float(lat), float(lng)) for _, lat, lng in rows))
+    return sorted(
+        (distance, car_id) for distance, (car_id, _, _) in zip(distances, rows) if distance <= radius_km
+    )
+
+
+def nearest(queryset, latitude, longitude, limit, radius_km=None, start_radius_km=10):
+    """Up to ``limit`` cars of ``queryset`` nearest to the origin, each with ``distance_km`` set.
+
+    Without ``radius_km`` the search radius doubles until ``limit`` cars
+    fall inside it; those are then provably the nearest ones.
+    """
+    queryset = queryset.filter(latitude__isnull=False, longitude__isnull=False)
+    if radius_km is not None:
+        found = within(queryset, latitude, longitude, radius_km)
+    else:
+        radius = start_radius_km
+        while True:
+            found = within(queryset, latitude, longitude, radius)
+            if len(found) >= limit or radius >= MAX_DISTANCE_KM:
+                break
+            radius = min(radius * 2, MAX_DISTANCE_KM)
+
+    found = found[:limit]
+    cars = queryset.in_bulk([car_id for _, car_id in found])
+    result = []
+    for distance, car_id in found:
+        car = cars[car_id]
+        car.distance_km = round(distance, 2)
+        result.append(car)
+    return result
@@ -0,0 +1,178 @@
+"""Resized WebP and JPEG variants of the car photos.
+
+Every stored image gets ``thumb``, ``card`` and ``detail`` variants (never
+upscaled) in both formats, under names derived from a hash of the source
+bytes, so they can be served with far-future expiry and identical uploads
+share files. The variant list is kept in the model's ``image_variants``
+JSON, keyed by image field, together with the source name it was built
+from; the ``responsive_image`` tag falls back to the original until it
+matches. A source that cannot be rendered (missing or unreadable file)
+gets a manifest carrying only its name and the error, so it is not
+retried on every save; ``backfill_image_variants`` retries those.
+
+Variants are rendered after commit in a process pool (Pillow work would
+otherwise hold the request, and the GIL); ``IMAGE_VARIANT_WORKERS = 0``
+renders them inline. ``backfill_image_variants`` processes existing media.
+"""
+import functools
+import hashlib
+import io
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> width in pixels
+SIZES = {'thumb': 160, 'card': 480, 'detail': 1200}
+# Format -> (Pillow format, save options)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+VARIANT_DIR = 'variants'
+
+_pool = None
+
+
+def flatten(image):
+    """RGB copy of ``image``, transparent areas on white (JPEG has no alpha)"""
+    if image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        return background
+    return image.convert('RGB')
+
+
+def render_variants(name):
+    """Create the missing variants of the stored image ``name`` and return its manifest.
+
+    Runs in the pool's worker processes, so it touches storage and Pillow
+    only, never the database.
+    """
+    with default_storage.open(name, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data).hexdigest()[:24]
+
+    source = Image.open(io.BytesIO(data))
+    # Let JPEGs decode at a reduced scale that still covers the largest variant
+    source.draft('RGB', (max(SIZES.values()), max(SIZES.values())))
+    image = flatten(ImageOps.exif_transpose(source))
+    width, height = image.size
+
+    variants = {}
+    for size, max_width in sorted(SIZES.items(), key=lambda item: -item[1]):
+        target_width = min(width, max_width)
+        target_height = max(1, round(height * target_width / width))
+        resized = image if target_width == width else image.resize((target_width, target_height), Image.Resampling.LANCZOS)
+        variant = {'width': target_width, 'height': target_height}
+        for fmt, (pil_format, options) in FORMATS.items():
+            path = f'{VARIANT_DIR}/{digest[:2]}/{digest}-{target_width}.{fmt}'
+            if not default_storage.exists(path):
+                buffer = io.BytesIO()
+                resized.save(buffer, pil_format, **options)
+                saved = default_storage.save(path, ContentFile(buffer.getvalue()))
+                if saved != path:
+                    # Another worker wrote the same variant first
+                    default_storage.delete(saved)
+            variant[fmt] = path
+        variants[size] = variant
+        # Smaller variants are resized from this one, which is cheaper than from the original
+        image = resized
+    return {'source': name, 'width': width, 'height': height, 'variants': variants}
+
+
+def manifest_of(instance, field):
+    """Stored manifest of the image ``field`` holds now, or None when it is missing or stale"""
+    manifest = (instance.image_variants or {}).get(field)
+    if manifest and manifest.get('source') == getattr(instance, field).name:
+        return manifest
+    return None
+
+
+def is_current(instance, field):
+    """Whether variants built from the image ``field`` holds now are stored"""
+    manifest = manifest_of(instance, field)
+    return bool(manifest) and 'variants' in manifest
+
+
+def failure_manifest(name, exc):
+    return {'source': name, 'error': f'{type(exc).__name__}: {exc}'}
+
+
+def store_manifest(model, pk, field, manifest):
+    """Record ``manifest`` for one image, unless that image was replaced meanwhile"""
+    rows = model.objects.filter(pk=pk, **{field: manifest['source']})
+    with transaction.atomic():
+        current = rows.select_for_update().values_list('image_variants', flat=True).first()
+        if current is None:
+            return 0
+        changes = {'image_variants': {**current, field: manifest}}
+        if 'variants' in manifest and any(f.name == 'updated_at' for f in model._meta.concrete_fields):
+            # The page markup changes: expire cached cards and move Last-Modified
+            changes['updated_at'] = timezone.now()
+        return rows.update(**changes)
+
+
+def pool():
+    global _pool
+    if _pool is None:
+        # Spawned, not forked: the workers must not inherit database connections or threads
+        _pool = ProcessPoolExecutor(
+            max_workers=getattr(settings, 'IMAGE_VARIANT_WORKERS', 2),
+            mp_context=multiprocessing.get_context('spawn'),
+        )
+    return _pool
+
+
+def submit(model, pk, field, name):
+    if not getattr(settings, 'IMAGE_VARIANT_WORKERS', 2):
+        _store(model, pk, field, name, functools.partial(render_variants, name))
+        return
+    future = pool().submit(render_variants, name)
+    future.add_done_callback(functools.partial(_store_result, model, pk, field, name))
+
+
+def _store(model, pk, field, name, result):
+    """Store the manifest ``result()`` returns, or a failure manifest when it raises"""
+    try:
+        try:
+            manifest = result()
+        except Exception as exc:
+            logger.error(f"Image variants failed for {model.__name__} #{pk} {field} ({name}): {exc}")
+            manifest = failure_manifest(name, exc)
+        store_manifest(model, pk, field, manifest)
+    except Exception:
+        logger.exception(f"Storing image variants failed for {model.__name__} #{pk} {field} ({name})")
+
+
+def _store_result(model, pk, field, name, future):
+    # Runs on the executor's management thread, which has its own connections
+    try:
+        _store(model, pk, field, name, future.result)
+    finally:
+        connections.close_all()
+
+
+def _submit_all(model, pk, jobs):
+    for field, name in jobs:
+        submit(model, pk, field, name)
+
+
+def schedule_variants(instance, fields):
+    """Render variants of the image ``fields`` of ``instance`` lacking a manifest for their source, after commit"""
+    jobs = [
+        (field, getattr(instance, field).name)
+        for field in fields
+        if getattr(instance, field) and manifest_of(instance, field) is None
+    ]
+    if jobs:
+        transaction.on_commit(functools.partial(_submit_all, type(instance), instance.pk, jobs))
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rentals.models import Car, CarFeature
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Fill the CarFeature index from the features list of every existing car'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Cars read per batch')
+        parser.add_argument('--rebuild', action='store_true', help='Delete every CarFeature row first')
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        if options['rebuild']:
+            deleted, _ = CarFeature.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} feature rows.')
+        
+        cars = written = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                Car.objects.filter(pk__gt=last_pk).order_by('pk').values_list('pk', 'features')[:options['batch_size']]
+            )
+            if not rows:
+                break
+            
+            with transaction.atomic():
+                created = CarFeature.objects.bulk_create(
+                    [CarFeature(car_id=pk, name=name) for pk, features in rows for name in CarFeature.names_of(features)],
+                    ignore_conflicts=True,
+                )
+            cars += len(rows)
+            written += len(created)
+            last_pk = rows[-1][0]
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully processed {written} features of {cars} cars in {elapsed:.1f}s.')
+        )
+        logger.info(f"Car feature backfill: {written} rows for {cars} cars in {elapsed:.1f}s")
@@ -0,0 +1,52 @@
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from django.core.management.base import BaseCommand
+from rentals.images import failure_manifest, is_current, render_variants, store_manifest
+from rentals.models import Car, CarImage
+import logging
+import multiprocessing
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Render the resized image variants of every car photo that lacks them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='Resizing processes')
+        parser.add_argument('--force', action='store_true', help='Also re-render images whose variants are stored')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        # Stored name -> the (model, pk, field) rows showing it; each file is rendered once
+        pending = {}
+        for model in (Car, CarImage):
+            for obj in model.objects.only('pk', 'image_variants', *model.image_fields).iterator():
+                for field in model.image_fields:
+                    if getattr(obj, field) and (options['force'] or not is_current(obj, field)):
+                        pending.setdefault(getattr(obj, field).name, []).append((model, obj.pk, field))
+        self.stdout.write(f'{len(pending)} images to process.')
+
+        stored = failed = 0
+        with ProcessPoolExecutor(max_workers=max(1, options['workers']), mp_context=multiprocessing.get_context('spawn')) as pool:
+            futures = {pool.submit(render_variants, name): name for name in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    manifest = future.result()
+                except Exception as exc:
+                    failed += 1
+                    self.stderr.write(f'{name}: {exc}')
+                    manifest = failure_manifest(name, exc)
+                    for model, pk, field in pending[name]:
+                        store_manifest(model, pk, field, manifest)
+                    continue
+                for model, pk, field in pending[name]:
+                    stored += store_manifest(model, pk, field, manifest)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully stored variants for {stored} images ({failed} failed) in {elapsed:.1f}s.')
+        )
+        logger.info(f"Image variant backfill: {stored} stored, {failed} failed in {elapsed:.1f}s")
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from bookings.models import Booking
+from rentals.models import CarOccupancy, Rental
+from rentals.availability import reservation_index
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Backfill the car occupancy ledger from existing rentals and bookings'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rows read and inserted per batch')
+        parser.add_argument('--rebuild', action='store_true', help='Delete the existing ledger before backfilling')
+    
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        
+        if options['rebuild']:
+            deleted, _ = CarOccupancy.objects.all().delete()
+            self.stdout.write(f'Deleted {deleted} ledger rows.')
+        
+        total = 0
+        for source, model in (('rental', Rental), ('booking', Booking)):
+            count = self.backfill(source, model, options['batch_size'])
+            self.stdout.write(f'{source}: {count} rows processed')
+            total += count
+        
+        reservation_index.invalidate()
+        
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully processed {total} reservations in {elapsed:.1f}s.')
+        )
+        logger.info(f"Occupancy backfill: {total} rows in {elapsed:.1f}s")
+    
+    def backfill(self, source, model, batch_size):
+        """Copy one reservation table in primary key order, skipping rows already in the ledger"""
+        processed = 0
+        last_pk = 0
+        while True:
+            rows = list(
+                model.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', 'car_id', 'start_date', 'end_date', 'status')[:batch_size]
+            )
+            if not rows:
+                return processed
+            
+            with transaction.atomic():
+                CarOccupancy.objects.bulk_create(
+                    [
+                        CarOccupancy(
+                            source=source, source_id=pk, car_id=car_id,
+                            start_date=start_date, end_date=end_date, status=status
+                        )
+                        for pk, car_id, start_date, end_date, status in rows
+                    ],
+                    ignore_conflicts=True,
+                )
+            processed += len(rows)
+            last_pk = rows[-1][0]
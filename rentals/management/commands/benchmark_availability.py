@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from rentals.availability import CarIntervals
+from datetime import date, timedelta
+import random
+import sqlite3
+import statistics
+import time
+
+class Command(BaseCommand):
+    help = 'Compare overlap-check latency of the in-memory interval index against the indexed SQL query'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=10000)
+        parser.add_argument('--reservations', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cars = options['cars']
+        first_day = date.today() - timedelta(days=365)
+
+        self.stdout.write(f"Generating {options['reservations']} reservations for {cars} cars...")
+        rows = []
+        for pk in range(1, options['reservations'] + 1):
+            start = first_day + timedelta(days=rng.randrange(730))
+            end = start + timedelta(days=rng.randint(1, 14))
+            rows.append((pk, rng.randint(1, cars), start, end))
+
+        # Same table shape and composite index as Booking/Rental (car, start_date, end_date)
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE reservation (id INTEGER PRIMARY KEY, car_id INTEGER, start_date TEXT, end_date TEXT, status TEXT)')
+        db.executemany(
+            'INSERT INTO reservation VALUES (?, ?, ?, ?, ?)',
+            ((pk, car_id, start.isoformat(), end.isoformat(), 'confirmed') for pk, car_id, start, end in rows)
+        )
+        db.execute('CREATE INDEX reservation_car_dates ON reservation (car_id, start_date, end_date)')
+        db.commit()
+
+        started = time.perf_counter()
+        per_car = {}
+        for pk, car_id, start, end in rows:
+            per_car.setdefault(car_id, []).append((start, end, pk))
+        index = {car_id: CarIntervals(intervals) for car_id, intervals in per_car.items()}
+        self.stdout.write(f"Index built in {time.perf_counter() - started:.2f}s")
+
+        queries = []
+        for _ in range(options['queries']):
+            start = first_day + timedelta(days=rng.randrange(730))
+            queries.append((rng.randint(1, cars), start, start + timedelta(days=rng.randint(1, 14))))
+
+        sql = (
+            "SELECT 1 FROM reservation WHERE car_id = ? AND status IN ('pending', 'confirmed', 'active') "
+            "AND start_date < ? AND end_date > ? LIMIT 1"
+        )
+        sql_timings, sql_answers = [], []
+        for car_id, start, end in queries:
+            t0 = time.perf_counter()
+            sql_answers.append(db.execute(sql, (car_id, end.isoformat(), start.isoformat())).fetchone() is not None)
+            sql_timings.append(time.perf_counter() - t0)
+
+        index_timings, index_answers = [], []
+        empty = CarIntervals()
+        for car_id, start, end in queries:
+            t0 = time.perf_counter()
+            index_answers.append(index.get(car_id, empty).overlaps(start, end))
+            index_timings.append(time.perf_counter() - t0)
+
+        mismatches = sum(1 for a, b in zip(sql_answers, index_answers) if a != b)
+        self.report('SQL exists()', sql_timings)
+        self.report('Interval index', index_timings)
+
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} answers differ between SQL and the index'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {len(queries)} answers match'))
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{label:<16} mean {statistics.mean(timings) * 1e6:8.1f}us  "
+            f"p50 {timings[len(timings) // 2] * 1e6:8.1f}us  p99 {p99 * 1e6:8.1f}us"
+        )
@@ -0,0 +1,102 @@
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from carrentalsystem.cache_backends import SQLiteCache
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+class Command(BaseCommand):
+    help = 'Time get/set/get_many/incr on the local-memory, SQLite and (when reachable) Redis cache backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=5000)
+        parser.add_argument('--batch', type=int, default=20, help='Keys per get_many/set_many call')
+        parser.add_argument('--threads', type=int, default=4, help='Concurrent incr threads for the atomicity check')
+        parser.add_argument('--redis', default=os.environ.get('REDIS_URL', ''), help='Redis URL; skipped if empty')
+
+    def handle(self, *args, **options):
+        backends = [('locmem', LocMemCache('benchmark', {}))]
+        directory = tempfile.mkdtemp()
+        backends.append(('sqlite', SQLiteCache(os.path.join(directory, 'cache.sqlite3'), {
+            'OPTIONS': {'MAX_ENTRIES': options['ops'] * 2},
+        })))
+        if options['redis']:
+            try:
+                from django.core.cache.backends.redis import RedisCache
+                redis = RedisCache(options['redis'], {})
+                redis.set('benchmark:ping', 1)
+                backends.append(('redis', redis))
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'Skipping Redis: {e}'))
+
+        # Browse-page sized values: a list of car ids and a count
+        value = {'ids': list(range(12)), 'total': 240}
+        batch = options['batch']
+        for name, cache in backends:
+            cache.clear()
+            keys = [f'bench:{i}' for i in range(options['ops'])]
+
+            set_timings = []
+            for key in keys:
+                t0 = time.perf_counter()
+                cache.set(key, value, 300)
+                set_timings.append(time.perf_counter() - t0)
+
+            get_timings = []
+            for key in keys:
+                t0 = time.perf_counter()
+                cache.get(key)
+                get_timings.append(time.perf_counter() - t0)
+
+            many_timings = []
+            for start in range(0, len(keys), batch):
+                t0 = time.perf_counter()
+                cache.get_many(keys[start:start + batch])
+                many_timings.append(time.perf_counter() - t0)
+
+            set_many_timings = []
+            for start in range(0, len(keys), batch):
+                chunk = {key: value for key in keys[start:start + batch]}
+                t0 = time.perf_counter()
+                cache.set_many(chunk, 300)
+                set_many_timings.append(time.perf_counter() - t0)
+
+            cache.set('bench:version', 0, None)
+            per_thread = options['ops'] // options['threads']
+            incr_timings = []
+
+            def bump():
+                for _ in range(per_thread):
+                    t0 = time.perf_counter()
+                    cache.incr('bench:version')
+                    incr_timings.append(time.perf_counter() - t0)
+
+            threads = [threading.Thread(target=bump) for _ in range(options['threads'])]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+            self.stdout.write(f'\n{name}')
+            self.report('set', set_timings)
+            self.report('get', get_timings)
+            self.report(f'get_many x{batch}', many_timings)
+            self.report(f'set_many x{batch}', set_many_timings)
+            self.report('incr (threaded)', incr_timings)
+            expected = per_thread * options['threads']
+            found = cache.get('bench:version')
+            if found == expected:
+                self.stdout.write(self.style.SUCCESS(f'incr: {found} of {expected} increments kept'))
+            else:
+                self.stdout.write(self.style.ERROR(f'incr: {found} of {expected} increments kept'))
+            cache.clear()
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"  {label:<18} mean {statistics.mean(timings) * 1e6:8.1f}us  "
+            f"p50 {timings[len(timings) // 2] * 1e6:8.1f}us  p99 {p99 * 1e6:8.1f}us"
+        )
@@ -0,0 +1,89 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.template import engines
+from django.template.loader import get_template
+from django.utils import timezone
+from rentals.models import Car
+from rentals.templatetags.car_cards import card_key
+import hashlib
+import random
+import statistics
+import time
+
+TEMPLATES = {
+    'owner': ('rentals/partials/owner_car_card.html', ''),
+    'favorite': ('bookings/partials/favorite_car_card.html', 'car'),
+}
+
+class Holder:
+    """Stands in for a FavoriteCar"""
+    def __init__(self, car):
+        self.car = car
+
+class Command(BaseCommand):
+    help = 'Time rendering a page of car cards inline against the cached card fragments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cards', type=int, default=50)
+        parser.add_argument('--runs', type=int, default=200)
+        parser.add_argument('--card', choices=sorted(TEMPLATES), default='owner')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        template_name, car_attr = TEMPLATES[options['card']]
+        now = timezone.now()
+        # Unsaved cars: rendering needs no database, and ids far above real ones keep the keys apart
+        cars = [
+            Car(
+                pk=10 ** 9 + i, make=rng.choice(['Audi', 'BMW', 'Fiat', 'Toyota']), model=f'M{i}', year=2020,
+                car_type='sedan', fuel_type='petrol', transmission='manual', seats=5, daily_rate=50 + i,
+                city='Paris', image=f'car_images/{i}.jpg', is_available=bool(i % 3),
+                avg_rating=4.2, rating_count=7, updated_at=now,
+            )
+            for i in range(options['cards'])
+        ]
+        items = [Holder(car) for car in cars] if car_attr else cars
+
+        # The card markup rendered in the page loop, as before the fragments
+        engine = engines['django']
+        inline = engine.from_string(
+            '{% for item in items %}<div>{% include "' + template_name + '" with car=item'
+            + (f'.{car_attr}' if car_attr else '') + ' %}</div>{% endfor %}'
+        )
+        cached = engine.from_string(
+            '{% load car_cards %}{% car_cards items "' + template_name + '" car_attr="' + car_attr
+            + '" as cards %}{% for item, card in cards %}<div>{{ card }}</div>{% endfor %}'
+        )
+        digest = hashlib.md5(get_template(template_name).template.source.encode()).hexdigest()[:12]
+        keys = [card_key(digest, car) for car in cars]
+
+        inline_timings = self.time(lambda: inline.render({'items': items}), options['runs'])
+        cold_timings = self.time(lambda: cached.render({'items': items}), options['runs'], setup=lambda: cache.delete_many(keys))
+        warm_timings = self.time(lambda: cached.render({'items': items}), options['runs'])
+        cache.delete_many(keys)
+
+        self.stdout.write(f"{options['cards']} {options['card']} cards, {options['runs']} renders each")
+        self.report('Inline render', inline_timings)
+        self.report('Fragments, cold', cold_timings)
+        self.report('Fragments, warm', warm_timings)
+        speedup = statistics.mean(inline_timings) / statistics.mean(warm_timings)
+        self.stdout.write(self.style.SUCCESS(f'Warm fragments render {speedup:.1f}x faster than inline'))
+
+    def time(self, render, runs, setup=None):
+        timings = []
+        for _ in range(runs):
+            if setup:
+                setup()
+            t0 = time.perf_counter()
+            render()
+            timings.append(time.perf_counter() - t0)
+        return timings
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{label:<18} mean {statistics.mean(timings) * 1e3:8.2f}ms  "
+            f"p50 {timings[len(timings) // 2] * 1e3:8.2f}ms  p99 {p99 * 1e3:8.2f}ms"
+        )
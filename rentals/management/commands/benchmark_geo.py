@@ -0,0 +1,96 @@
+from django.core.management.base import BaseCommand
+from rentals.geo import distances_km
+import math
+import random
+import sqlite3
+import statistics
+import time
+
+# Rough population centres, so the fleet is clustered the way real cars are
+CENTRES = [(48.86, 2.35), (45.76, 4.84), (52.52, 13.40), (40.42, -3.70), (41.90, 12.50), (51.51, -0.13)]
+
+class Command(BaseCommand):
+    help = 'Time the bounding-box + haversine distance search against a full haversine scan'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--radius', type=float, default=25.0, help='Radius in km for the radius queries')
+        parser.add_argument('--nearest', type=int, default=20, help='N for the nearest-N queries')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"Generating {options['cars']} cars...")
+        rows = []
+        for pk in range(1, options['cars'] + 1):
+            lat, lng = rng.choice(CENTRES)
+            rows.append((pk, lat + rng.gauss(0, 0.8), lng + rng.gauss(0, 1.2)))
+
+        # Same column types and index as rentals_car (latitude, longitude)
+        db = sqlite3.connect(':memory:')
+        db.execute('CREATE TABLE car (id INTEGER PRIMARY KEY, latitude REAL, longitude REAL)')
+        db.executemany('INSERT INTO car VALUES (?, ?, ?)', rows)
+        db.execute('CREATE INDEX car_lat_lng ON car (latitude, longitude)')
+        db.commit()
+
+        origins = []
+        for _ in range(options['queries']):
+            lat, lng = rng.choice(CENTRES)
+            origins.append((lat + rng.gauss(0, 0.5), lng + rng.gauss(0, 0.5)))
+        radius = options['radius']
+
+        scan_timings, scan_answers = [], []
+        for lat, lng in origins:
+            t0 = time.perf_counter()
+            found = db.execute('SELECT id, latitude, longitude FROM car').fetchall()
+            distances = distances_km(lat, lng, ((a, b) for _, a, b in found))
+            scan_answers.append(sorted(d for d in distances if d <= radius))
+            scan_timings.append(time.perf_counter() - t0)
+
+        box_timings, box_answers = [], []
+        for lat, lng in origins:
+            t0 = time.perf_counter()
+            box_answers.append(sorted(d for d, _ in self.within(db, lat, lng, radius)))
+            box_timings.append(time.perf_counter() - t0)
+
+        nearest_timings = []
+        for lat, lng in origins:
+            t0 = time.perf_counter()
+            search_radius = 10.0
+            while True:
+                found = self.within(db, lat, lng, search_radius)
+                if len(found) >= options['nearest'] or search_radius > 20000:
+                    break
+                search_radius *= 2
+            found[:options['nearest']]
+            nearest_timings.append(time.perf_counter() - t0)
+
+        mismatches = sum(1 for a, b in zip(scan_answers, box_answers) if a != b)
+        self.report('Full haversine scan', scan_timings)
+        self.report(f'Box + haversine {radius:g}km', box_timings)
+        self.report(f"Nearest {options['nearest']}", nearest_timings)
+        self.stdout.write(f'Mean cars within {radius:g}km: {statistics.mean(len(a) for a in box_answers):.0f}')
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f'{mismatches} radius answers differ from the full scan'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'All {len(origins)} radius answers match the full scan'))
+
+    def within(self, db, lat, lng, radius):
+        # Same box as rentals.geo.bounding_box away from the poles and the antimeridian
+        lat_delta = math.degrees(radius / 6371.0088)
+        lng_delta = math.degrees(math.asin(math.sin(radius / 6371.0088) / math.cos(math.radians(lat))))
+        found = db.execute(
+            'SELECT id, latitude, longitude FROM car WHERE latitude BETWEEN ? AND ? AND longitude BETWEEN ? AND ?',
+            (lat - lat_delta, lat + lat_delta, lng - lng_delta, lng + lng_delta)
+        ).fetchall()
+        distances = distances_km(lat, lng, ((a, b) for _, a, b in found))
+        return sorted((d, pk) for d, (pk, _, _) in zip(distances, found) if d <= radius)
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{label:<22} mean {statistics.mean(timings) * 1e3:8.2f}ms  "
+            f"p50 {timings[len(timings) // 2] * 1e3:8.2f}ms  p99 {p99 * 1e3:8.2f}ms"
+        )
@@ -0,0 +1,97 @@
+from django.core.management.base import BaseCommand
+from rentals.search import SEARCH_FIELDS, terms
+import json
+import random
+import sqlite3
+import statistics
+import time
+
+MAKES = {
+    'Toyota': ['Corolla', 'Camry', 'RAV4', 'Prius'], 'Honda': ['Civic', 'Accord', 'CR-V'],
+    'Ford': ['Focus', 'Mustang', 'Transit'], 'BMW': ['X5', '320i', 'i4'], 'Tesla': ['Model 3', 'Model Y'],
+    'Renault': ['Clio', 'Zoe', 'Megane'], 'Volkswagen': ['Golf', 'Polo', 'ID.4'], 'Kia': ['Niro', 'Sportage'],
+}
+CITIES = ['Paris', 'Lyon', 'Marseille', 'Berlin', 'Munich', 'Madrid', 'Lisbon', 'Rome', 'Milan', 'Vienna']
+FEATURES = ['GPS', 'Bluetooth', 'Heated seats', 'Sunroof', 'Child seat', 'Apple CarPlay', 'Cruise control', 'Roof rack']
+WORDS = 'clean spacious quiet economical comfortable family reliable sporty automatic diesel hybrid'.split()
+
+class Command(BaseCommand):
+    help = 'Compare free-text car search through FTS5 against the LIKE scan it replaces'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cars', type=int, default=100000)
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        self.stdout.write(f"Generating {options['cars']} cars...")
+        rows = []
+        for pk in range(1, options['cars'] + 1):
+            make = rng.choice(list(MAKES))
+            city = rng.choice(CITIES)
+            rows.append((
+                pk, make, rng.choice(MAKES[make]), ' '.join(rng.sample(WORDS, 5)), city,
+                f'{rng.randint(1, 200)} Rue de la Gare, {city}', json.dumps(rng.sample(FEATURES, 3)),
+            ))
+
+        # Same columns as rentals_car / rentals_car_fts
+        db = sqlite3.connect(':memory:')
+        columns = ', '.join(SEARCH_FIELDS)
+        db.execute(f'CREATE TABLE car (id INTEGER PRIMARY KEY, {columns})')
+        db.executemany('INSERT INTO car VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+        started = time.perf_counter()
+        db.execute(f"CREATE VIRTUAL TABLE car_fts USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')")
+        db.execute(f'INSERT INTO car_fts (rowid, {columns}) SELECT id, {columns} FROM car')
+        db.commit()
+        self.stdout.write(f"FTS index built in {time.perf_counter() - started:.2f}s")
+
+        queries = []
+        for _ in range(options['queries']):
+            make = rng.choice(list(MAKES))
+            queries.append(rng.choice([
+                f'{make} {rng.choice(MAKES[make])} {rng.choice(CITIES)}',
+                f'{rng.choice(MAKES[make])} {rng.choice(FEATURES).split()[0]}',
+                f'{make} {rng.choice(WORDS)}',
+                f'{rng.choice(CITIES)}',
+            ]))
+
+        # A LIMIT without ORDER BY lets the scan stop early on common words, so
+        # every variant collects all matches: that is what counting or ranking needs
+        like_timings, like_counts = [], []
+        for text in queries:
+            words = terms(text)
+            clause = ' AND '.join(
+                '(' + ' OR '.join(f'{name} LIKE ?' for name in SEARCH_FIELDS) + ')' for _ in words
+            )
+            params = [f'%{word}%' for word in words for _ in SEARCH_FIELDS]
+            t0 = time.perf_counter()
+            like_counts.append(len(db.execute(f'SELECT id FROM car WHERE {clause}', params).fetchall()))
+            like_timings.append(time.perf_counter() - t0)
+
+        fts_timings, fts_counts, ranked_timings = [], [], []
+        for text in queries:
+            match = ' '.join(f'"{word}"*' for word in terms(text))
+            t0 = time.perf_counter()
+            fts_counts.append(len(db.execute('SELECT rowid FROM car_fts WHERE car_fts MATCH ?', [match]).fetchall()))
+            fts_timings.append(time.perf_counter() - t0)
+            t0 = time.perf_counter()
+            db.execute('SELECT rowid FROM car_fts WHERE car_fts MATCH ? ORDER BY bm25(car_fts) LIMIT 10', [match]).fetchall()
+            ranked_timings.append(time.perf_counter() - t0)
+
+        self.report('LIKE scan', like_timings)
+        self.report('FTS5 match', fts_timings)
+        self.report('FTS5 ranked top 10', ranked_timings)
+        self.stdout.write(
+            f'Mean matches per query: LIKE {statistics.mean(like_counts):.0f}, FTS {statistics.mean(fts_counts):.0f} '
+            '(LIKE also matches inside words)'
+        )
+        self.stdout.write(self.style.SUCCESS(f'{len(queries)} queries over {len(rows)} cars'))
+
+    def report(self, label, timings):
+        timings = sorted(timings)
+        p99 = timings[int(len(timings) * 0.99) - 1]
+        self.stdout.write(
+            f"{label:<22} mean {statistics.mean(timings) * 1e3:8.2f}ms  "
+            f"p50 {timings[len(timings) // 2] * 1e3:8.2f}ms  p99 {p99 * 1e3:8.2f}ms"
+        )
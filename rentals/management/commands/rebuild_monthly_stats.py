@@ -0,0 +1,54 @@
+from collections import defaultdict
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import TruncMonth
+from bookings.models import Booking, BookingReview
+from rentals.models import OwnerMonthlyStats, Rental, Review
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute the OwnerMonthlyStats rollup from rentals, bookings and reviews'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        totals = defaultdict(lambda: {'bookings': 0, 'revenue': 0, 'rating_sum': 0, 'rating_count': 0})
+
+        def collect(queryset, owner_path, **aggregates):
+            rows = (
+                queryset.order_by()
+                .annotate(month=TruncMonth('created_at', output_field=DateField()))
+                .values(owner_path, 'month')
+                .annotate(**aggregates)
+            )
+            for row in rows:
+                entry = totals[(row.pop(owner_path), row.pop('month'))]
+                for name, value in row.items():
+                    entry[name] += value or 0
+
+        collect(
+            Rental.objects.all(), 'car__owner',
+            bookings=Count('id'), revenue=Sum('total_amount', filter=Q(payment_status=True))
+        )
+        collect(
+            Booking.objects.all(), 'car__owner',
+            bookings=Count('id'), revenue=Sum('total_amount', filter=Q(payment_status='paid'))
+        )
+        collect(Review.objects.all(), 'rental__car__owner', rating_sum=Sum('rating'), rating_count=Count('id'))
+        collect(BookingReview.objects.all(), 'booking__car__owner', rating_sum=Sum('rating'), rating_count=Count('id'))
+
+        with transaction.atomic():
+            OwnerMonthlyStats.objects.all().delete()
+            OwnerMonthlyStats.objects.bulk_create(
+                [OwnerMonthlyStats(owner_id=owner_id, month=month, **values) for (owner_id, month), values in totals.items()],
+                batch_size=1000
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully rebuilt {len(totals)} monthly stats rows in {elapsed:.2f}s.')
+        )
+        logger.info(f"Monthly stats rebuild: {len(totals)} rows in {elapsed:.2f}s")
@@ -0,0 +1,61 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, IntegerField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, Coalesce
+from bookings.models import BookingReview
+from carrentalsystem.cache_tags import coarse_tags
+from rentals.models import Car, Review
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+class Command(BaseCommand):
+    help = 'Recompute the stored rating aggregates of every car from Review and BookingReview'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+
+        def per_car(reviews, car_path, aggregate):
+            return Coalesce(
+                Subquery(
+                    reviews.filter(**{car_path: OuterRef('pk')})
+                    .order_by()
+                    .values(car_path)
+                    .annotate(value=aggregate)
+                    .values('value'),
+                    output_field=IntegerField()
+                ),
+                Value(0)
+            )
+
+        expected_sum = (
+            per_car(Review.objects.all(), 'rental__car', Sum('rating'))
+            + per_car(BookingReview.objects.all(), 'booking__car', Sum('rating'))
+        )
+        expected_count = (
+            per_car(Review.objects.all(), 'rental__car', Count('id'))
+            + per_car(BookingReview.objects.all(), 'booking__car', Count('id'))
+        )
+
+        with transaction.atomic():
+            drifted = Car.objects.annotate(
+                expected_sum=expected_sum, expected_count=expected_count
+            ).filter(~Q(rating_sum=F('expected_sum')) | ~Q(rating_count=F('expected_count'))).count()
+
+            # Every car may change: expire the fleet-wide tags once instead of one tag per car
+            Car.objects.update(rating_sum=expected_sum, rating_count=expected_count, _tags=coarse_tags(Car))
+            Car.objects.update(
+                _tags=set(),
+                avg_rating=Case(
+                    When(rating_count__gt=0, then=Cast('rating_sum', FloatField()) / F('rating_count')),
+                    default=Value(0.0),
+                    output_field=FloatField()
+                )
+            )
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(
+            self.style.SUCCESS(f'Successfully reconciled ratings ({drifted} cars were out of date) in {elapsed:.2f}s.')
+        )
+        logger.info(f"Rating reconcile: {drifted} cars corrected in {elapsed:.2f}s")
@@ -1,32 +1,82 @@
 from django.core.management.base import BaseCommand
-from rentals.models import Car, Rental
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Max, Min
+from rentals.models import Car, CarOccupancy
+from rentals.availability import BLOCKING_STATUSES
 from django.utils import timezone
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
 class Command(BaseCommand):
-    help = 'Update car availability based on current rentals'
-    
+    help = 'Update car availability based on current rentals and bookings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=0,
+            help='Process cars in primary key ranges of this size (default: whole fleet at once)'
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report the cars that would change without updating them'
+        )
+
     def handle(self, *args, **options):
-        updated_count = 0
-        
-        for car in Car.objects.all():
-            # Check if car has any active rentals
-            has_active_rentals = Rental.objects.filter(
-                car=car,
-                status__in=['pending', 'confirmed', 'active'],
-                end_date__gte=timezone.now().date()
-            ).exists()
-            
-            # Update availability
-            new_availability = not has_active_rentals
-            if car.is_available != new_availability:
-                car.is_available = new_availability
-                car.save()
-                updated_count += 1
-        
+        started = time.monotonic()
+        today = timezone.now().date()
+
+        # Cars with any pending, confirmed or active reservation that has not ended yet
+        busy = Exists(CarOccupancy.objects.filter(
+            car=OuterRef('pk'),
+            status__in=BLOCKING_STATUSES,
+            end_date__gte=today
+        ))
+
+        made_unavailable = made_available = 0
+        for id_range in self.id_ranges(options['chunk_size']):
+            cars = Car.objects.all()
+            if id_range:
+                cars = cars.filter(pk__gte=id_range[0], pk__lt=id_range[1])
+            to_unavailable = cars.filter(is_available=True).filter(busy)
+            to_available = cars.filter(is_available=False).exclude(busy)
+
+            if options['dry_run']:
+                made_unavailable += self.report(to_unavailable, 'available -> unavailable')
+                made_available += self.report(to_available, 'unavailable -> available')
+                continue
+
+            with transaction.atomic():
+                now = timezone.now()
+                made_unavailable += to_unavailable.update(is_available=False, updated_at=now)
+                made_available += to_available.update(is_available=True, updated_at=now)
+
+        elapsed = time.monotonic() - started
+        verb = 'Would update' if options['dry_run'] else 'Successfully updated'
         self.stdout.write(
-            self.style.SUCCESS(f'Successfully updated availability for {updated_count} cars.')
+            self.style.SUCCESS(
+                f'{verb} availability for {made_unavailable + made_available} cars '
+                f'({made_unavailable} now unavailable, {made_available} now available) in {elapsed:.2f}s.'
+            )
         )
-        logger.info(f"Car availability update: {updated_count} cars updated")
\ No newline at end of file
+        if not options['dry_run']:
+            logger.info(
+                f"Car availability update: {made_unavailable + made_available} cars updated in {elapsed:.2f}s"
+            )
+
+    def id_ranges(self, chunk_size):
+        """Yield half-open [low, high) primary key ranges, or a single None for the whole table"""
+        if chunk_size <= 0:
+            yield None
+            return
+        bounds = Car.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if bounds['low'] is None:
+            return
+        for low in range(bounds['low'], bounds['high'] + 1, chunk_size):
+            yield low, low + chunk_size
+
+    def report(self, cars, change):
+        rows = list(cars.order_by('pk').values_list('pk', 'license_plate'))
+        for pk, license_plate in rows:
+            self.stdout.write(f'  Car #{pk} ({license_plate}): {change}')
+        return len(rows)
@@ -1,10 +1,13 @@
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Cast
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.utils import timezone
 from datetime import timedelta
+from carrentalsystem.cache_tags import TaggedQuerySet, tags_from_values
+from carrentalsystem.tracking import FieldTrackerMixin
 
-class Car(models.Model):
+class Car(FieldTrackerMixin, models.Model):
     CAR_TYPES = [
         ('sedan', 'Sedan'),
         ('suv', 'SUV'),
@@ -60,12 +63,21 @@ class Car(models.Model):
     image = models.ImageField(upload_to='car_images/')
     image_2 = models.ImageField(upload_to='car_images/', blank=True, null=True)
     image_3 = models.ImageField(upload_to='car_images/', blank=True, null=True)
+    # Resized variants per image field (rentals.images)
+    image_variants = models.JSONField(default=dict, blank=True)
+    
+    # Rating aggregates over Review and BookingReview, maintained by the review signals
+    rating_sum = models.PositiveIntegerField(default=0)
+    rating_count = models.PositiveIntegerField(default=0)
+    avg_rating = models.FloatField(default=0)
     
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     is_active = models.BooleanField(default=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Car'
@@ -75,8 +87,15 @@ class Car(models.Model):
             models.Index(fields=['car_type', 'fuel_type']),
             models.Index(fields=['daily_rate']),
             models.Index(fields=['city']),
+            # Keyset pagination order of the browse page
+            models.Index(fields=['-created_at', '-id']),
+            # Bounding-box prefilter of the distance search (rentals.geo)
+            models.Index(fields=['latitude', 'longitude']),
         ]
     
+    tracked_fields = ('features',)
+    image_fields = ('image', 'image_2', 'image_3')
+    
     def __str__(self):
         return f"{self.year} {self.make} {self.model} - {self.license_plate}"
     
@@ -84,6 +103,17 @@ class Car(models.Model):
     def full_name(self):
         return f"{self.year} {self.make} {self.model}"
     
+    @classmethod
+    def set_availability(cls, car_id, is_available, owner_id=None):
+        """Write only the availability column (and updated_at), skipping cars that already match.
+        
+        Pass ``owner_id`` when it is known, so only that owner's cache tag is bumped.
+        """
+        known = {'pk': car_id, 'owner_id': owner_id} if owner_id is not None else {'pk': car_id}
+        return cls.objects.filter(pk=car_id).exclude(is_available=is_available).update(
+            is_available=is_available, updated_at=timezone.now(), _tags=tags_from_values(cls, **known)
+        )
+    
     @property
     def is_rentable(self):
         """Check if car can be rented (available and no active rentals)"""
@@ -99,17 +129,38 @@ class Car(models.Model):
     
     @property
     def average_rating(self):
-        """Calculate average rating from completed rentals with reviews"""
-        reviews = Review.objects.filter(rental__car=self, rental__status='completed')
-        if reviews.exists():
-            return round(reviews.aggregate(avg_rating=models.Avg('rating'))['avg_rating'], 1)
-        return 0
+        """Average rating of rental and booking reviews, from the stored aggregates"""
+        return round(self.avg_rating, 1)
     
     @property
     def total_reviews(self):
-        return Review.objects.filter(rental__car=self, rental__status='completed').count()
+        return self.rating_count
+    
+    @classmethod
+    def adjust_rating(cls, cars, rating_delta, count_delta, tags=None):
+        """Apply a review change to the stored aggregates of ``cars`` in one UPDATE"""
+        new_sum = models.F('rating_sum') + rating_delta
+        new_count = models.F('rating_count') + count_delta
+        return cars.update(
+            _tags=tags,
+            rating_sum=new_sum,
+            rating_count=new_count,
+            # The rating is part of the car pages' Last-Modified
+            updated_at=timezone.now(),
+            # Right-hand sides see the old column values, hence the shifted comparison
+            avg_rating=models.Case(
+                models.When(
+                    rating_count__gt=-count_delta,
+                    then=models.ExpressionWrapper(
+                        Cast(new_sum, models.FloatField()) / new_count,
+                        output_field=models.FloatField()
+                    )
+                ),
+                default=models.Value(0.0),
+            ),
+        )
 
-class Rental(models.Model):
+class Rental(FieldTrackerMixin, models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pending Approval'),
         ('confirmed', 'Confirmed'),
@@ -141,6 +192,8 @@ class Rental(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Rental'
@@ -149,6 +202,9 @@ class Rental(models.Model):
             models.Index(fields=['customer', 'status']),
             models.Index(fields=['car', 'start_date', 'end_date']),
             models.Index(fields=['status', 'payment_status']),
+            # Keyset pagination of the owner's rental list: per car of the owner, optionally per status
+            models.Index(fields=['car', '-created_at', '-id']),
+            models.Index(fields=['status', '-created_at', '-id']),
         ]
         constraints = [
             models.CheckConstraint(
@@ -157,41 +213,60 @@ class Rental(models.Model):
             )
         ]
     
+    tracked_fields = ('status', 'start_date', 'end_date', 'payment_status', 'total_amount')
+    
     def __str__(self):
         return f"Rental #{self.id} - {self.car} by {self.customer.username}"
     
     def save(self, *args, **kwargs):
-        # Calculate total days and amount automatically
-        if self.start_date and self.end_date:
+        # Calculate total days and amount automatically when the dates change
+        if self.start_date and self.end_date and (self.has_changed('start_date') or self.has_changed('end_date')):
             self.total_days = (self.end_date - self.start_date).days
             if self.total_days > 0 and self.car:
                 self.total_amount = self.total_days * self.car.daily_rate
         
-        # Update car availability
-        if self.pk:
-            old_status = Rental.objects.get(pk=self.pk).status
-            if old_status != self.status:
-                self.update_car_availability(old_status)
-        else:
-            if self.status in ['confirmed', 'active']:
-                self.car.is_available = False
-                self.car.save()
-        
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            # Update car availability
+            if not self._state.adding:
+                old_status = self.get_loaded_value('status')
+                if old_status != self.status:
+                    self.update_car_availability(old_status)
+            else:
+                if self.status in ['confirmed', 'active']:
+                    self.set_car_availability(False)
+            
+            old_paid_amount = None if self._state.adding else self.paid_amount(
+                self.get_loaded_value('payment_status'), self.get_loaded_value('total_amount')
+            )
+            super().save(*args, **kwargs)
+            CarOccupancy.record('rental', self)
+            OwnerMonthlyStats.record_reservation(self, old_paid_amount)
+    
+    @staticmethod
+    def paid_amount(payment_status, total_amount):
+        """Revenue a rental counts for in the owner's monthly stats"""
+        return total_amount if payment_status else 0
     
     def update_car_availability(self, old_status):
         """Update car availability when rental status changes"""
         if self.status in ['confirmed', 'active']:
-            self.car.is_available = False
+            if old_status not in ['confirmed', 'active']:
+                self.set_car_availability(False)
         elif self.status in ['completed', 'cancelled', 'rejected']:
             # Check if there are no other active rentals for this car
             active_rentals = Rental.objects.filter(
-                car=self.car,
+                car_id=self.car_id,
                 status__in=['pending', 'confirmed', 'active'],
             ).exclude(pk=self.pk)
             if not active_rentals.exists():
-                self.car.is_available = True
-        self.car.save()
+                self.set_car_availability(True)
+    
+    def set_car_availability(self, is_available):
+        if Rental.car.is_cached(self):
+            Car.set_availability(self.car_id, is_available, self.car.owner_id)
+            self.car.is_available = is_available
+        else:
+            Car.set_availability(self.car_id, is_available)
     
     @property
     def can_be_cancelled(self):
@@ -214,7 +289,7 @@ class Rental(models.Model):
     def is_overdue(self):
         return self.status == 'active' and self.end_date < timezone.now().date()
 
-class Review(models.Model):
+class Review(FieldTrackerMixin, models.Model):
     RATING_CHOICES = [
         (1, '1 Star'),
         (2, '2 Stars'),
@@ -229,6 +304,8 @@ class Review(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
         verbose_name = 'Review'
@@ -238,20 +315,232 @@ class Review(models.Model):
             models.Index(fields=['rating']),
         ]
     
+    tracked_fields = ('rating',)
+    
     def __str__(self):
         return f"Review for {self.rental.car} - {self.rating} stars"
 
 class CarImage(models.Model):
     car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='images')
     image = models.ImageField(upload_to='car_images/')
+    image_variants = models.JSONField(default=dict, blank=True)
     caption = models.CharField(max_length=100, blank=True)
     is_primary = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-is_primary', 'created_at']
         verbose_name = 'Car Image'
         verbose_name_plural = 'Car Images'
     
+    image_fields = ('image',)
+    
+    def __str__(self):
+        return f"Image for {self.car}"
+
+class CarOccupancy(models.Model):
+    """Occupancy ledger shared by rentals and bookings.
+    
+    Every Rental and Booking writes one row here in the same transaction as
+    its own save, so availability checks, calendars and utilization reports
+    read this narrow table through one covering index instead of querying
+    both reservation tables.
+    """
+    SOURCE_CHOICES = [
+        ('rental', 'Rental'),
+        ('booking', 'Booking'),
+    ]
+    
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='occupancy')
+    start_date = models.DateField()
+    end_date = models.DateField()
+    source = models.CharField(max_length=10, choices=SOURCE_CHOICES)
+    source_id = models.PositiveBigIntegerField()
+    status = models.CharField(max_length=20)
+    
+    objects = TaggedQuerySet.as_manager()
+    
+    class Meta:
+        verbose_name = 'Car Occupancy'
+        verbose_name_plural = 'Car Occupancy'
+        indexes = [
+            # Covering index for overlap checks: car = ? AND status IN (...) AND end_date > ? AND start_date < ?
+            models.Index(fields=['car', 'status', 'end_date', 'start_date']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['source', 'source_id'], name='occupancy_unique_source'),
+        ]
+    
     def __str__(self):
-        return f"Image for {self.car}"
\ No newline at end of file
+        return f"{self.car_id}: {self.start_date} - {self.end_date} ({self.source} #{self.source_id}, {self.status})"
+    
+    @classmethod
+    def record(cls, source, reservation):
+        """Insert or update the ledger row of a saved Rental or Booking"""
+        from .availability import reservation_index
+        
+        values = {
+            'car_id': reservation.car_id,
+            'start_date': reservation.start_date,
+            'end_date': reservation.end_date,
+            'status': reservation.status,
+        }
+        updated = cls.objects.filter(source=source, source_id=reservation.pk).update(**values)
+        if not updated:
+            cls.objects.create(source=source, source_id=reservation.pk, **values)
+        reservation_index.record_on_commit(
+            reservation.car_id, (source, reservation.pk), reservation.start_date, reservation.end_date, reservation.status
+        )
+    
+    @classmethod
+    def discard(cls, source, reservation):
+        from .availability import reservation_index
+        
+        cls.objects.filter(source=source, source_id=reservation.pk).delete()
+        reservation_index.discard_on_commit(reservation.car_id, (source, reservation.pk))
+
+class OwnerMonthlyStats(models.Model):
+    """Per owner, per calendar month rollup of rentals, bookings and reviews.
+    
+    Reservations count towards the month they were created in and reviews
+    towards the month they were written in. Rows are adjusted in the same
+    transaction as the change they reflect; ``rebuild_monthly_stats``
+    recomputes them from scratch.
+    """
+    owner = models.ForeignKey('users.CarOwner', on_delete=models.CASCADE, related_name='monthly_stats')
+    month = models.DateField(help_text='First day of the month')
+    bookings = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    
+    class Meta:
+        ordering = ['owner', 'month']
+        verbose_name = 'Owner Monthly Stats'
+        verbose_name_plural = 'Owner Monthly Stats'
+        constraints = [
+            # Also the index behind the analytics range query: owner = ? AND month BETWEEN ? AND ?
+            models.UniqueConstraint(fields=['owner', 'month'], name='owner_monthly_stats_unique_month'),
+        ]
+    
+    def __str__(self):
+        return f"{self.owner_id} {self.month:%b %Y}: {self.bookings} bookings, {self.revenue} revenue"
+    
+    @property
+    def average_rating(self):
+        return round(self.rating_sum / self.rating_count, 1) if self.rating_count else 0
+    
+    @staticmethod
+    def month_of(moment):
+        """First day of the local calendar month of a datetime, matching TruncMonth"""
+        return timezone.localdate(moment).replace(day=1)
+    
+    @classmethod
+    def adjust(cls, owner_id, month, create=True, **deltas):
+        """Add ``deltas`` to the row of (owner, month), creating it if needed"""
+        deltas = {name: delta for name, delta in deltas.items() if delta}
+        if not deltas or owner_id is None:
+            return
+        rows = cls.objects.filter(owner_id=owner_id, month=month)
+        changes = {name: models.F(name) + delta for name, delta in deltas.items()}
+        if rows.update(**changes) or not create:
+            return
+        try:
+            with transaction.atomic():
+                cls.objects.create(owner_id=owner_id, month=month, **deltas)
+        except IntegrityError:
+            # Created concurrently since the UPDATE above
+            rows.update(**changes)
+    
+    @classmethod
+    def record_reservation(cls, reservation, old_paid_amount):
+        """Account for a saved Rental or Booking; ``old_paid_amount`` is None when it was just created"""
+        paid_amount = reservation.paid_amount(reservation.payment_status, reservation.total_amount)
+        if old_paid_amount is None:
+            bookings, revenue = 1, paid_amount
+        else:
+            bookings, revenue = 0, paid_amount - old_paid_amount
+        if bookings == 0 and not revenue:
+            return
+        cls.adjust(cls.owner_of(reservation), cls.month_of(reservation.created_at), bookings=bookings, revenue=revenue)
+    
+    @staticmethod
+    def owner_of(reservation):
+        """Owner id of a reservation's car, from the loaded car when there is one"""
+        car = reservation._state.fields_cache.get('car')
+        if car is not None:
+            return car.owner_id
+        return Car.objects.filter(pk=reservation.car_id).values_list('owner_id', flat=True).first()
+    
+    @classmethod
+    def discard_reservation(cls, reservation, owner_id):
+        # Never create rows here: during cascades the owner itself may be on its way out
+        cls.adjust(
+            owner_id,
+            cls.month_of(reservation.created_at),
+            create=False,
+            bookings=-1,
+            revenue=-reservation.paid_amount(reservation.payment_status, reservation.total_amount),
+        )
+
+class CarFeature(models.Model):
+    """One row per (car, feature): an indexed form of ``Car.features``.
+    
+    Kept in step with the JSON list by the Car post_save signal;
+    ``backfill_car_features`` fills it for existing cars.
+    """
+    car = models.ForeignKey(Car, on_delete=models.CASCADE, related_name='feature_rows')
+    name = models.CharField(max_length=50)
+    
+    class Meta:
+        verbose_name = 'Car Feature'
+        verbose_name_plural = 'Car Features'
+        constraints = [
+            models.UniqueConstraint(fields=['car', 'name'], name='car_feature_unique_name'),
+        ]
+        indexes = [
+            # Feature filters probe by name first: name = ? AND car_id = ?
+            models.Index(fields=['name', 'car']),
+        ]
+    
+    def __str__(self):
+        return f"{self.car_id}: {self.name}"
+    
+    @staticmethod
+    def normalize(name):
+        """Lowercase, single-spaced form used for storage and lookups"""
+        return ' '.join(str(name).split()).lower()[:50]
+    
+    @classmethod
+    def names_of(cls, features):
+        if isinstance(features, dict):
+            features = [key for key, value in features.items() if value]
+        elif not isinstance(features, (list, tuple)):
+            features = [features] if features else []
+        return {name for name in map(cls.normalize, features) if name}
+    
+    @classmethod
+    def sync(cls, car):
+        """Make the rows of ``car`` match its features list"""
+        wanted = cls.names_of(car.features)
+        current = set(cls.objects.filter(car=car).values_list('name', flat=True))
+        if current - wanted:
+            cls.objects.filter(car=car, name__in=current - wanted).delete()
+        if wanted - current:
+            cls.objects.bulk_create(
+                [cls(car=car, name=name) for name in wanted - current], ignore_conflicts=True
+            )
+    
+    @classmethod
+    def filter_cars(cls, queryset, names, match_all=True):
+        """Cars having all (or any) of ``names``, through indexed (name, car) probes"""
+        names = sorted({cls.normalize(name) for name in names if cls.normalize(name)})
+        if not names:
+            return queryset
+        if match_all:
+            for name in names:
+                queryset = queryset.filter(models.Exists(cls.objects.filter(car=models.OuterRef('pk'), name=name)))
+            return queryset
+        return queryset.filter(models.Exists(cls.objects.filter(car=models.OuterRef('pk'), name__in=names)))
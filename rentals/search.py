@@ -0,0 +1,164 @@
+"""Full-text car search.
+
+SQLite keeps an FTS5 table ``rentals_car_fts`` whose rowid is the car id,
+written from the Car save/delete signals. PostgreSQL uses a GIN index on
+the same ``to_tsvector`` expression the query filters on, so the database
+keeps it current by itself. Other backends fall back to ``icontains``.
+Either way ``search_cars`` annotates ``search_rank`` (higher is better).
+"""
+import re
+
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'rentals_car_fts'
+SEARCH_FIELDS = ('make', 'model', 'description', 'city', 'pickup_location', 'features')
+
+PG_INDEX = 'rentals_car_search_idx'
+
+
+def pg_vector_sql(table=''):
+    """The tsvector expression; the index and the queries must use the same one"""
+    prefix = f'{table}.' if table else ''
+    columns = [
+        f"coalesce({prefix}{name}::text, '')" if name == 'features' else f"coalesce({prefix}{name}, '')"
+        for name in SEARCH_FIELDS
+    ]
+    joined = " || ' ' || ".join(columns)
+    return f"to_tsvector('simple', {joined})"
+
+
+def terms(text):
+    """Words of a free-text query, lowercased; punctuation never reaches the query syntax"""
+    return re.findall(r'\w+', text.lower())[:10]
+
+
+def feature_text(features):
+    if isinstance(features, (list, tuple)):
+        return ' '.join(str(feature) for feature in features)
+    if isinstance(features, dict):
+        return ' '.join(f'{key} {value}' for key, value in features.items())
+    return str(features or '')
+
+
+def ensure_search_index(using=None):
+    """Create the backend's search structure if it does not exist yet.
+    
+    A SQLite FTS table created here is filled from the existing cars, so
+    searches work on a database that had cars before the index existed.
+    """
+    conn = connections[using] if using else connection
+    with conn.cursor() as cursor:
+        if conn.vendor == 'sqlite':
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            if cursor.fetchone():
+                return
+            columns = ', '.join(SEARCH_FIELDS)
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE {FTS_TABLE} "
+                f"USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        elif conn.vendor == 'postgresql':
+            cursor.execute(f"CREATE INDEX IF NOT EXISTS {PG_INDEX} ON rentals_car USING GIN ({pg_vector_sql()})")
+            return
+        else:
+            return
+    fill_search_index(conn.alias)
+
+
+def rebuild_search_index():
+    """Refill the SQLite FTS table from every car; returns the number of rows written"""
+    if connection.vendor != 'sqlite':
+        return 0
+    ensure_search_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+    return fill_search_index()
+
+
+def fill_search_index(using=None):
+    """Insert the FTS rows of every car into an empty table"""
+    from .models import Car
+
+    written = 0
+    cars = Car.objects.using(using).values_list('pk', *SEARCH_FIELDS).order_by('pk')
+    batch = []
+    for row in cars.iterator(chunk_size=2000):
+        batch.append(fts_row(row))
+        if len(batch) >= 2000:
+            written += insert_rows(batch, using)
+            batch = []
+    return written + insert_rows(batch, using)
+
+
+def fts_row(row):
+    pk, *values = row
+    values[-1] = feature_text(values[-1])
+    return [pk, *[value or '' for value in values]]
+
+
+def insert_rows(rows, using=None):
+    if not rows:
+        return 0
+    placeholders = ', '.join(['%s'] * (len(SEARCH_FIELDS) + 1))
+    with (connections[using] if using else connection).cursor() as cursor:
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(SEARCH_FIELDS)}) VALUES ({placeholders})", rows
+        )
+    return len(rows)
+
+
+def index_car(car):
+    """Write one car's row to the SQLite FTS table (nothing to do on other backends)"""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [car.pk])
+    insert_rows([fts_row([car.pk, *[getattr(car, name) for name in SEARCH_FIELDS]])])
+
+
+def unindex_car(car_id):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [car_id])
+
+
+def search_cars(queryset, text):
+    """Restrict a Car queryset to matches of ``text`` and annotate ``search_rank``"""
+    words = terms(text)
+    if not words:
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'sqlite':
+        # Every word must match, as a prefix so "toy" finds Toyota
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(
+            pk__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        ).annotate(
+            # bm25() is lower for better matches
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = {table}.id",
+                [match],
+                output_field=FloatField()
+            )
+        )
+
+    if connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{word}:*' for word in words)
+        vector = pg_vector_sql(table)
+        return queryset.filter(
+            RawSQL(f"{vector} @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        ).annotate(
+            search_rank=RawSQL(f"ts_rank({vector}, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())
+        )
+
+    condition = Q()
+    for word in words:
+        condition &= (
+            Q(make__icontains=word) | Q(model__icontains=word) | Q(description__icontains=word)
+            | Q(city__icontains=word) | Q(pickup_location__icontains=word)
+        )
+    return queryset.filter(condition).annotate(search_rank=Value(0.0, output_field=FloatField()))
@@ -0,0 +1,101 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from carrentalsystem.cache_tags import register as register_cache_tags, tags_from_values
+from bookings.models import Booking, BookingReview, FavoriteCar
+from users.models import CarOwner
+from .models import Car, CarFeature, CarImage, CarOccupancy, OwnerMonthlyStats, Rental, Review
+from .availability import reservation_index
+from .images import schedule_variants
+from .search import index_car, unindex_car
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Cached data each model's rows feed into (see carrentalsystem.cache_tags). Review
+# rating changes reach the car tags through the Car.adjust_rating UPDATE.
+register_cache_tags(Car, 'car:{pk}', 'owner:{owner_id}', 'browse')
+register_cache_tags(CarOwner, 'owner:{pk}')
+register_cache_tags(Rental, 'car:{car_id}', 'owner:{car__owner_id}', 'customer:{customer_id}')
+register_cache_tags(Booking, 'car:{car_id}', 'owner:{car__owner_id}', 'customer:{customer_id}')
+register_cache_tags(CarOccupancy, 'occupancy')
+register_cache_tags(CarImage, 'car:{car_id}')
+register_cache_tags(Review, 'car:{rental__car_id}')
+register_cache_tags(BookingReview, 'car:{booking__car_id}')
+register_cache_tags(FavoriteCar, 'favorites:{customer_id}')
+
+@receiver(post_delete, sender=Rental)
+def remove_rental_occupancy(sender, instance, **kwargs):
+    """Drop the ledger row of a deleted rental (also runs for cascades)"""
+    CarOccupancy.discard('rental', instance)
+    OwnerMonthlyStats.discard_reservation(instance, OwnerMonthlyStats.owner_of(instance))
+
+@receiver(post_delete, sender=Booking)
+def remove_booking_occupancy(sender, instance, **kwargs):
+    """Drop the ledger row of a deleted booking (also runs for cascades)"""
+    CarOccupancy.discard('booking', instance)
+    OwnerMonthlyStats.discard_reservation(instance, OwnerMonthlyStats.owner_of(instance))
+
+@receiver(post_delete, sender=Car)
+def drop_car_from_index(sender, instance, **kwargs):
+    reservation_index.invalidate(instance.pk)
+    unindex_car(instance.pk)
+
+@receiver(post_save, sender=Car)
+def update_search_index(sender, instance, **kwargs):
+    index_car(instance)
+
+@receiver(post_save, sender=Car)
+@receiver(post_save, sender=CarImage)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    # Also catches a manifest lost to a full save of an instance loaded before it was stored
+    if not raw:
+        schedule_variants(instance, sender.image_fields)
+
+@receiver(post_save, sender=Car)
+def update_feature_rows(sender, instance, created, **kwargs):
+    # The tracked value is still the pre-save one here
+    if created or instance.has_changed('features'):
+        CarFeature.sync(instance)
+
+def rating_change(instance, created):
+    """(rating delta, count delta) of a saved review; the tracked rating is still the pre-save one"""
+    if created:
+        return instance.rating, 1
+    return instance.rating - (instance.get_loaded_value('rating') or 0), 0
+
+def apply_rating_change(instance, cars, rating_delta, count_delta, create=True):
+    """Push a review change into the car aggregates and the owner's monthly stats"""
+    car = cars.values_list('pk', 'owner_id').first()
+    if car is None:
+        return
+    car_id, owner_id = car
+    Car.adjust_rating(
+        Car.objects.filter(pk=car_id), rating_delta, count_delta, tags_from_values(Car, pk=car_id, owner_id=owner_id)
+    )
+    OwnerMonthlyStats.adjust(
+        owner_id,
+        OwnerMonthlyStats.month_of(instance.created_at),
+        create=create,
+        rating_sum=rating_delta,
+        rating_count=count_delta,
+    )
+
+@receiver(post_save, sender=Review)
+def update_rating_on_review_save(sender, instance, created, **kwargs):
+    rating_delta, count_delta = rating_change(instance, created)
+    if rating_delta or count_delta:
+        apply_rating_change(instance, Car.objects.filter(rentals=instance.rental_id), rating_delta, count_delta)
+
+@receiver(post_delete, sender=Review)
+def update_rating_on_review_delete(sender, instance, **kwargs):
+    apply_rating_change(instance, Car.objects.filter(rentals=instance.rental_id), -instance.rating, -1, create=False)
+
+@receiver(post_save, sender=BookingReview)
+def update_rating_on_booking_review_save(sender, instance, created, **kwargs):
+    rating_delta, count_delta = rating_change(instance, created)
+    if rating_delta or count_delta:
+        apply_rating_change(instance, Car.objects.filter(bookings=instance.booking_id), rating_delta, count_delta)
+
+@receiver(post_delete, sender=BookingReview)
+def update_rating_on_booking_review_delete(sender, instance, **kwargs):
+    apply_rating_change(instance, Car.objects.filter(bookings=instance.booking_id), -instance.rating, -1, create=False)
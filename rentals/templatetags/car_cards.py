@@ -0,0 +1,45 @@
+"""Cached car card fragments.
+
+    {% load car_cards %}
+    {% car_cards cars "rentals/partials/owner_car_card.html" as cards %}
+    {% for car, card in cards %}{{ card }}{% endfor %}
+
+A card depends only on its car: it is rendered with ``car`` as its sole
+context and cached under the car id, ``updated_at`` and rating (rating and
+availability changes move ``updated_at``), plus a digest of the card
+template so new markup never meets old entries. All cards of a page come
+from one ``get_many``; only the missing ones are rendered, and stored with
+one ``set_many``.
+"""
+import hashlib
+
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import get_template, render_to_string
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+def card_key(digest, car):
+    return f'card:{digest}:{car.pk}:{car.updated_at.timestamp()}:{car.rating_count}:{car.avg_rating}'
+
+
+@register.simple_tag
+def car_cards(items, template_name, car_attr=''):
+    """[(item, card html)] for ``items``: cars, or objects whose ``car_attr`` is the car"""
+    items = list(items)
+    cars = [getattr(item, car_attr) if car_attr else item for item in items]
+    digest = hashlib.md5(get_template(template_name).template.source.encode()).hexdigest()[:12]
+    keys = [card_key(digest, car) for car in cars]
+
+    cards = cache.get_many(keys)
+    missing = {}
+    for key, car in zip(keys, cars):
+        if key not in cards and key not in missing:
+            missing[key] = render_to_string(template_name, {'car': car})
+    if missing:
+        cache.set_many(missing, getattr(settings, 'CAR_CARD_CACHE_TIMEOUT', 3600))
+        cards.update(missing)
+    return [(item, mark_safe(cards[key])) for item, key in zip(items, keys)]
@@ -0,0 +1,51 @@
+"""Responsive, lazily loaded car photos.
+
+    {% load car_images %}
+    {% responsive_image car "image" "card" alt="Car photo" css_class="car-image" %}
+
+Renders a ``<picture>`` offering the WebP variants and the JPEG ones as
+fallback, each as a ``srcset`` of every variant width, with ``size``
+picking the ``<img>`` width and height (so the layout does not shift while
+the photo loads). Until the variants of the current image are stored (see
+``rentals.images``) the original is rendered, still lazily loaded.
+"""
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from rentals.images import SIZES, is_current
+
+register = template.Library()
+
+
+def srcset(variants, fmt):
+    widths = {}
+    for variant in variants.values():
+        # Images narrower than a variant width give several variants the same file
+        widths.setdefault(variant['width'], default_storage.url(variant[fmt]))
+    return ', '.join(f'{url} {width}w' for width, url in sorted(widths.items()))
+
+
+@register.simple_tag
+def responsive_image(obj, field='image', size='card', alt='', css_class='', style='', sizes=''):
+    """``<picture>`` for the image ``field`` of ``obj``, shown at the ``size`` variant"""
+    image = getattr(obj, field)
+    if not image:
+        return ''
+    if not is_current(obj, field):
+        return format_html(
+            '<img src="{}" class="{}" style="{}" alt="{}" loading="lazy" decoding="async">',
+            image.url, css_class, style, alt,
+        )
+
+    variants = obj.image_variants[field]['variants']
+    shown = variants[size]
+    sizes = sizes or f'{SIZES[size]}px'
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" width="{}" height="{}" class="{}" style="{}" alt="{}" '
+        'loading="lazy" decoding="async"></picture>',
+        srcset(variants, 'webp'), sizes,
+        default_storage.url(shown['jpeg']), srcset(variants, 'jpeg'), sizes,
+        shown['width'], shown['height'], css_class, style, alt,
+    )
@@ -1,3 +1,177 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from carrentalsystem.cache_tags import tags_for, tags_for_queryset
+from carrentalsystem.testing import image_file, make_car
+from users.models import User
+from . import images, search
+from .models import Car, OwnerMonthlyStats, Rental
+
+
+class RentalTestCase(TestCase):
+    def setUp(self):
+        # Tag versions are bumped on commit, which never happens inside a TestCase
+        cache.clear()
+        self.owner_user = User.objects.create_user('owner', 'owner@example.com', 'password')
+        self.customer = User.objects.create_user('customer', 'customer@example.com', 'password')
+        self.car = make_car(self.owner_user)
+
+    def make_rental(self, status='pending', **kwargs):
+        start_date = timezone.now().date() + timedelta(days=1)
+        return Rental.objects.create(
+            car=self.car, customer=self.customer, start_date=start_date, end_date=start_date + timedelta(days=3),
+            total_amount=0, status=status, pickup_location='Depot', **kwargs
+        )
+
+
+class OwnerMonthlyStatsTests(RentalTestCase):
+    def test_record_reservation_counts_new_and_paid_rentals(self):
+        rental = self.make_rental()
+        rental = Rental.objects.get(pk=rental.pk)
+        rental.payment_status = True
+        rental.save()
+
+        stats = OwnerMonthlyStats.objects.get(owner=self.car.owner)
+        self.assertEqual((stats.bookings, stats.revenue), (1, Decimal('150.00')))
+
+    def test_record_reservation_skips_unchanged_totals(self):
+        rental = Rental.objects.get(pk=self.make_rental().pk)
+        rental.status = 'rejected'
+        with self.assertNumQueries(0):
+            OwnerMonthlyStats.record_reservation(rental, rental.paid_amount(False, rental.total_amount))
+
+
+class CacheTagsTests(RentalTestCase):
+    def test_owner_tag_comes_from_the_loaded_car(self):
+        rental = Rental.objects.select_related('car').get(pk=self.make_rental().pk)
+        with self.assertNumQueries(0):
+            tags = tags_for(rental)
+        self.assertEqual(tags, {f'car:{self.car.pk}', f'owner:{self.car.owner_id}', f'customer:{self.customer.pk}'})
+
+    def test_unloaded_relation_bumps_the_model_wide_tag(self):
+        rental = Rental.objects.get(pk=self.make_rental().pk)
+        with self.assertNumQueries(0):
+            tags = tags_for(rental)
+        self.assertEqual(tags, {f'car:{self.car.pk}', 'owner:*', f'customer:{self.customer.pk}'})
+
+    @override_settings(CACHE_TAGS_ROW_LIMIT=1)
+    def test_large_updates_bump_model_wide_tags(self):
+        make_car(self.customer, license_plate='TEST-OTHER')
+        self.assertEqual(tags_for_queryset(Car.objects.filter(pk=self.car.pk)), {
+            f'car:{self.car.pk}', f'owner:{self.car.owner_id}', 'browse'
+        })
+        self.assertEqual(tags_for_queryset(Car.objects.all()), {'car:*', 'owner:*', 'browse'})
+
+    def test_set_availability_with_known_owner_reads_nothing(self):
+        with self.assertNumQueries(1):
+            Car.set_availability(self.car.pk, False, self.car.owner_id)
+
+
+class CarFeatureTests(RentalTestCase):
+    def test_in_place_feature_edits_are_synced(self):
+        car = Car.objects.get(pk=self.car.pk)
+        car.features.append('GPS')
+        self.assertTrue(car.has_changed('features'))
+        car.save()
+        self.assertEqual(list(car.feature_rows.values_list('name', flat=True)), ['gps'])
+        self.assertFalse(car.has_changed('features'))
+
+
+class SearchTests(RentalTestCase):
+    def test_index_created_on_an_existing_database_is_filled(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE {search.FTS_TABLE}")
+        search.ensure_search_index()
+        self.assertEqual(list(search.search_cars(Car.objects.all(), 'corolla')), [self.car])
+
+    def test_page_numbers_follow_the_rank(self):
+        self.car.description = 'Corolla corolla corolla'
+        self.car.save()
+        newer = make_car(self.customer, license_plate='TEST-NEWER')
+        response = self.client.get(reverse('rentals:browse_cars'), {'q': 'corolla', 'page': 1})
+        self.assertEqual([car.pk for car in response.context['cars']], [self.car.pk, newer.pk])
+
+
+class ImageVariantTests(RentalTestCase):
+    def variant_jobs(self, callbacks):
+        return [callback for callback in callbacks if getattr(callback, 'func', None) is images._submit_all]
+
+    def test_variants_are_rendered_from_the_stored_image(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            car = make_car(self.customer, license_plate='TEST-IMAGE', image=image_file(600, 300))
+
+        car.refresh_from_db()
+        self.assertTrue(images.is_current(car, 'image'))
+        manifest = car.image_variants['image']
+        self.assertEqual((manifest['width'], manifest['height']), (600, 300))
+        sizes = {size: (variant['width'], variant['height']) for size, variant in manifest['variants'].items()}
+        # Never upscaled
+        self.assertEqual(sizes, {'thumb': (160, 80), 'card': (480, 240), 'detail': (600, 300)})
+        for fmt, pil_format in (('webp', 'WEBP'), ('jpeg', 'JPEG')):
+            with default_storage.open(manifest['variants']['thumb'][fmt]) as f:
+                variant = Image.open(f)
+                self.assertEqual((variant.format, variant.size), (pil_format, (160, 80)))
+
+    def test_unreadable_image_is_not_rescheduled(self):
+        with self.assertLogs(images.logger, 'ERROR'), self.captureOnCommitCallbacks(execute=True) as callbacks:
+            car = make_car(self.customer, license_plate='TEST-MISSING', image='car_images/missing.png')
+        self.assertEqual(len(self.variant_jobs(callbacks)), 1)
+
+        car.refresh_from_db()
+        manifest = car.image_variants['image']
+        self.assertEqual(manifest['source'], 'car_images/missing.png')
+        self.assertIn('error', manifest)
+        self.assertFalse(images.is_current(car, 'image'))
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            car.save()
+        self.assertEqual(self.variant_jobs(callbacks), [])
+
+        car.image = 'car_images/replacement.png'
+        with self.captureOnCommitCallbacks() as callbacks:
+            car.save()
+        self.assertEqual(len(self.variant_jobs(callbacks)), 1)
+
+
+class RentalActionQueryTests(RentalTestCase):
+    """Statements per owner action: the status change must not reload the car or the rental"""
+
+    def setUp(self):
+        super().setUp()
+        self.rental = self.make_rental()
+        self.client.force_login(self.owner_user)
+        # Remember the profile ids in the session, so no counted request looks them up
+        self.client.get(reverse('rentals:owner_dashboard'))
+        self.assertIn('_profile_ids', self.client.session)
+
+    def post(self, action):
+        return self.client.post(reverse('rentals:rental_action', args=[self.rental.pk, action]))
+
+    def assertAction(self, action, queries, status):
+        # Session, user, owner profile and the rental with its car, plus the save
+        with self.assertNumQueries(4 + queries):
+            self.post(action)
+        self.assertEqual(Rental.objects.get(pk=self.rental.pk).status, status)
+
+    def test_approve(self):
+        # Savepoint, car availability, rental, ledger row, release
+        self.assertAction('approve', 5, 'confirmed')
+
+    def test_start(self):
+        self.post('approve')
+        # Savepoint, rental, ledger row, release
+        self.assertAction('start', 4, 'active')
+
+    def test_complete(self):
+        self.post('approve')
+        self.post('start')
+        # Savepoint, other open rentals, car availability, rental, ledger row, monthly revenue, release
+        self.assertAction('complete', 7, 'completed')
@@ -19,4 +19,5 @@ urlpatterns = [
     path('browse/', views.CarBrowseView.as_view(), name='browse_cars'),
     path('car/<int:pk>/', views.CarDetailView.as_view(), name='car_detail'),
     path('api/car/<int:car_id>/availability/', views.CarAvailabilityCheckView.as_view(), name='check_availability'),
+    path('api/cars/nearby/', views.CarNearbyView.as_view(), name='cars_nearby'),
 ]
\ No newline at end of file
@@ -4,47 +4,47 @@ from django.urls import reverse_lazy
 from django.utils import timezone
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib import messages
-from django.db.models import Q, Count, Sum, Avg
+from django.db.models import Q, Count, Sum, Avg, Max, QuerySet
 from django.http import JsonResponse
 from django.core.exceptions import PermissionDenied
+from django.core.cache import cache
+from django.conf import settings
 from datetime import datetime, timedelta
 import logging
 
+from carrentalsystem.cache_tags import CacheTagsMixin
+from carrentalsystem.caching import get_or_compute
+from carrentalsystem.conditional import ConditionalGetMixin
+from carrentalsystem.pagination import CursorPage, CursorPaginationMixin, CursorPaginator
+
 from users.models import CarOwner
-from .models import Car, Rental, Review
+from users.profiles import forget_profile, get_owner_profile
+from .models import Car, OwnerMonthlyStats, Rental, Review
+from .availability import reservation_index
+from . import geo
+from .facets import browse_cache_key, facet_counts
 from .forms import CarForm, RentalForm, ReviewForm, CarSearchForm
 
 logger = logging.getLogger(__name__)
 
-class OwnerDashboardView(LoginRequiredMixin, TemplateView):
+class OwnerDashboardView(LoginRequiredMixin, CacheTagsMixin, TemplateView):
     template_name = 'rentals/owner_dashboard.html'
     
+    def get(self, request, *args, **kwargs):
+        # Never create the profile on a GET; the profile page does that
+        if get_owner_profile(request) is None:
+            messages.info(request, "Please complete your owner profile to open the dashboard.")
+            return redirect('users:profile_update')
+        return super().get(request, *args, **kwargs)
+    
+    def get_cache_tags(self):
+        return [f'owner:{get_owner_profile(self.request).pk}']
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        car_owner = getattr(self.request.user, 'owner_profile', None)
-        if not car_owner:
-            car_owner = CarOwner.objects.create(user=self.request.user)
-        
-        # Calculate time ranges
-        today = timezone.now().date()
-        month_start = today.replace(day=1)
-        next_month = month_start + timedelta(days=32)
-        next_month = next_month.replace(day=1)
-        
-        # Get analytics data
-        monthly_earnings = Rental.objects.filter(
-            car__owner=car_owner,
-            created_at__date__gte=month_start,
-            created_at__date__lt=next_month,
-            payment_status=True
-        ).aggregate(total=Sum('total_amount'))['total'] or 0
-        
-        monthly_bookings = Rental.objects.filter(
-            car__owner=car_owner,
-            created_at__date__gte=month_start,
-            created_at__date__lt=next_month
-        ).count()
+        car_owner = get_owner_profile(self.request)
+        stats = self.get_stats(car_owner)
         
         # Get recent activities
         recent_rentals = Rental.objects.filter(car__owner=car_owner).select_related('car', 'customer').order_by('-created_at')[:5]
@@ -81,21 +81,46 @@ class OwnerDashboardView(LoginRequiredMixin, TemplateView):
         
         context.update({
             'owner': car_owner,
-            'total_cars': Car.objects.filter(owner=car_owner).count(),
-            'active_rentals': Rental.objects.filter(car__owner=car_owner, status='active').count(),
-            'pending_requests': Rental.objects.filter(car__owner=car_owner, status='pending').count(),
-            'available_cars': Car.objects.filter(owner=car_owner, is_available=True).count(),
             'owner_cars': Car.objects.filter(owner=car_owner)[:6],
-            'monthly_earnings': monthly_earnings,
-            'monthly_bookings': monthly_bookings,
-            'total_earnings': Rental.objects.filter(
-                car__owner=car_owner, 
-                payment_status=True
-            ).aggregate(total=Sum('total_amount'))['total'] or 0,
             'recent_activities': recent_activities,
+            **stats,
         })
         return context
     
+    def get_stats(self, car_owner):
+        """Dashboard counters: one conditional aggregate per table, cached per owner.
+        
+        The cache key is tagged ``owner:<id>``, which Car, Rental and Booking
+        changes bump (see the registrations in ``rentals.signals``).
+        """
+        cache_key = self.cache_key('dashboard_stats')
+        stats = cache.get(cache_key)
+        if stats is not None:
+            return stats
+        
+        # Calculate time ranges on created_at itself so the index can be used
+        month_start = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        next_month = (month_start + timedelta(days=32)).replace(day=1)
+        this_month = Q(created_at__gte=month_start, created_at__lt=next_month)
+        
+        car_stats = Car.objects.filter(owner=car_owner).aggregate(
+            total_cars=Count('id'),
+            available_cars=Count('id', filter=Q(is_available=True)),
+        )
+        rental_stats = Rental.objects.filter(car__owner=car_owner).aggregate(
+            active_rentals=Count('id', filter=Q(status='active')),
+            pending_requests=Count('id', filter=Q(status='pending')),
+            monthly_bookings=Count('id', filter=this_month),
+            monthly_earnings=Sum('total_amount', filter=this_month & Q(payment_status=True)),
+            total_earnings=Sum('total_amount', filter=Q(payment_status=True)),
+        )
+        stats = {**car_stats, **rental_stats}
+        stats['monthly_earnings'] = stats['monthly_earnings'] or 0
+        stats['total_earnings'] = stats['total_earnings'] or 0
+        
+        cache.set(cache_key, stats, getattr(settings, 'OWNER_STATS_CACHE_TIMEOUT', 300))
+        return stats
+    
     def get_time_ago(self, timestamp):
         now = timezone.now()
         diff = now - timestamp
@@ -116,14 +141,14 @@ class CarListView(LoginRequiredMixin, ListView):
     paginate_by = 8
     
     def get_queryset(self):
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if car_owner:
             return Car.objects.filter(owner=car_owner).select_related('owner')
         return Car.objects.none()
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if car_owner:
             context['stats'] = {
                 'total': Car.objects.filter(owner=car_owner).count(),
@@ -139,9 +164,10 @@ class CarCreateView(LoginRequiredMixin, CreateView):
     success_url = reverse_lazy('rentals:my_cars')
     
     def form_valid(self, form):
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if not car_owner:
             car_owner = CarOwner.objects.create(user=self.request.user)
+            forget_profile(self.request)
         form.instance.owner = car_owner
         
         messages.success(self.request, f"Car {form.instance.make} {form.instance.model} added successfully!")
@@ -154,7 +180,7 @@ class CarUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('rentals:my_cars')
     
     def get_queryset(self):
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if car_owner:
             return Car.objects.filter(owner=car_owner)
         return Car.objects.none()
@@ -165,20 +191,20 @@ class CarUpdateView(LoginRequiredMixin, UpdateView):
 
 class CarDeleteView(LoginRequiredMixin, View):
     def post(self, request, pk):
-        car = get_object_or_404(Car, pk=pk, owner=request.user.owner_profile)
+        car = get_object_or_404(Car, pk=pk, owner=get_owner_profile(request))
         car_name = f"{car.make} {car.model}"
         car.delete()
         messages.success(request, f"Car {car_name} deleted successfully!")
         return redirect('rentals:my_cars')
 
-class RentalListView(LoginRequiredMixin, ListView):
+class RentalListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     model = Rental
     template_name = 'rentals/rental_list.html'
     context_object_name = 'rentals'
     paginate_by = 10
     
     def get_queryset(self):
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if car_owner:
             status_filter = self.request.GET.get('status', 'all')
             queryset = Rental.objects.filter(car__owner=car_owner).select_related('car', 'customer')
@@ -191,7 +217,7 @@ class RentalListView(LoginRequiredMixin, ListView):
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if car_owner:
             context['status_filter'] = self.request.GET.get('status', 'all')
             context['status_counts'] = {
@@ -205,7 +231,8 @@ class RentalListView(LoginRequiredMixin, ListView):
 
 class RentalActionView(LoginRequiredMixin, View):
     def post(self, request, pk, action):
-        rental = get_object_or_404(Rental, pk=pk, car__owner=request.user.owner_profile)
+        # With the car loaded, saving the rental needs no query to find its owner
+        rental = get_object_or_404(Rental.objects.select_related('car'), pk=pk, car__owner=get_owner_profile(request))
         
         if action == 'approve' and rental.status == 'pending':
             rental.status = 'confirmed'
@@ -233,38 +260,52 @@ class RentalActionView(LoginRequiredMixin, View):
 
 class AnalyticsView(LoginRequiredMixin, TemplateView):
     template_name = 'rentals/analytics.html'
+    default_months = 6
+    max_months = 36
+    
+    def get_month_count(self):
+        try:
+            count = int(self.request.GET.get('months', self.default_months))
+        except ValueError:
+            return self.default_months
+        return min(max(count, self.default_months), self.max_months)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         
         if car_owner:
-            # Monthly earnings for the last 6 months
+            # Calendar months, oldest first, ending with the current one
+            current = OwnerMonthlyStats.month_of(timezone.now())
+            month_starts = []
+            year, month = current.year, current.month
+            for _ in range(self.get_month_count()):
+                month_starts.append(current.replace(year=year, month=month))
+                year, month = (year, month - 1) if month > 1 else (year - 1, 12)
+            month_starts.reverse()
+            
+            # One indexed range read of the rollup; months without activity have no row
+            stats_by_month = {
+                stats.month: stats
+                for stats in OwnerMonthlyStats.objects.filter(
+                    owner=car_owner, month__gte=month_starts[0], month__lte=current
+                )
+            }
             months = []
             earnings = []
             bookings_data = []
-            
-            for i in range(5, -1, -1):
-                month = timezone.now().replace(day=1) - timedelta(days=30*i)
-                next_month = month.replace(day=28) + timedelta(days=4)
-                next_month = next_month.replace(day=1)
-                
-                monthly_earnings = Rental.objects.filter(
-                    car__owner=car_owner,
-                    created_at__date__gte=month,
-                    created_at__date__lt=next_month,
-                    payment_status=True
-                ).aggregate(total=Sum('total_amount'))['total'] or 0
-                
-                monthly_bookings = Rental.objects.filter(
-                    car__owner=car_owner,
-                    created_at__date__gte=month,
-                    created_at__date__lt=next_month
-                ).count()
-                
+            for month in month_starts:
+                stats = stats_by_month.get(month)
                 months.append(month.strftime('%b %Y'))
-                earnings.append(float(monthly_earnings))
-                bookings_data.append(monthly_bookings)
+                earnings.append(float(stats.revenue) if stats else 0.0)
+                bookings_data.append(stats.bookings if stats else 0)
+            
+            totals = OwnerMonthlyStats.objects.filter(owner=car_owner).aggregate(
+                bookings=Sum('bookings'),
+                revenue=Sum('revenue'),
+                rating_sum=Sum('rating_sum'),
+                rating_count=Sum('rating_count'),
+            )
             
             # Popular cars
             popular_cars = Car.objects.filter(owner=car_owner).annotate(
@@ -277,14 +318,10 @@ class AnalyticsView(LoginRequiredMixin, TemplateView):
                 'months': months,
                 'earnings': earnings,
                 'bookings_data': bookings_data,
-                'total_bookings': Rental.objects.filter(car__owner=car_owner).count(),
-                'total_earnings': Rental.objects.filter(
-                    car__owner=car_owner, payment_status=True
-                ).aggregate(total=Sum('total_amount'))['total'] or 0,
+                'total_bookings': totals['bookings'] or 0,
+                'total_earnings': totals['revenue'] or 0,
                 'popular_cars': popular_cars,
-                'average_rating': Review.objects.filter(
-                    rental__car__owner=car_owner
-                ).aggregate(avg_rating=Avg('rating'))['avg_rating'] or 0,
+                'average_rating': round(totals['rating_sum'] / totals['rating_count'], 1) if totals['rating_count'] else 0,
             })
         
         return context
@@ -296,9 +333,10 @@ class OwnerSettingsView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('rentals:owner_dashboard')
     
     def get_object(self):
-        car_owner = getattr(self.request.user, 'owner_profile', None)
+        car_owner = get_owner_profile(self.request)
         if not car_owner:
             car_owner = CarOwner.objects.create(user=self.request.user)
+            forget_profile(self.request)
         return car_owner
     
     def form_valid(self, form):
@@ -306,59 +344,122 @@ class OwnerSettingsView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 # Public car browsing views
-class CarBrowseView(ListView):
+class CarBrowseView(ConditionalGetMixin, CursorPaginationMixin, ListView):
     """View for customers to browse available cars"""
     model = Car
     template_name = 'rentals/car_browse.html'
     context_object_name = 'cars'
     paginate_by = 9
+    max_nearby = 90
+    
+    def get_cache_tags(self):
+        # Same tags as the browse result and facet caches
+        return ['browse', 'occupancy'] if self.request.GET.get('start_date') else ['browse']
+    
+    def get_last_modified(self):
+        return self.filter_cars(CarSearchForm(self.request.GET)).aggregate(Max('updated_at'))['updated_at__max']
+    
+    def filter_cars(self, form):
+        queryset = Car.objects.filter(is_active=True)
+        if form.is_valid():
+            return form.filter_queryset(queryset)
+        return queryset.filter(is_available=True)
     
     def get_queryset(self):
-        queryset = Car.objects.filter(is_available=True, is_active=True)
-        
         # Apply filters
         form = CarSearchForm(self.request.GET)
+        queryset = self.filter_cars(form)
         if form.is_valid():
-            car_type = form.cleaned_data.get('car_type')
-            fuel_type = form.cleaned_data.get('fuel_type')
-            transmission = form.cleaned_data.get('transmission')
-            min_price = form.cleaned_data.get('min_price')
-            max_price = form.cleaned_data.get('max_price')
-            seats = form.cleaned_data.get('seats')
-            city = form.cleaned_data.get('city')
-            
-            if car_type:
-                queryset = queryset.filter(car_type=car_type)
-            if fuel_type:
-                queryset = queryset.filter(fuel_type=fuel_type)
-            if transmission:
-                queryset = queryset.filter(transmission=transmission)
-            if min_price:
-                queryset = queryset.filter(daily_rate__gte=min_price)
-            if max_price:
-                queryset = queryset.filter(daily_rate__lte=max_price)
-            if seats:
-                queryset = queryset.filter(seats__gte=seats)
-            if city:
-                queryset = queryset.filter(city__icontains=city)
+            self.searching = bool(form.cleaned_data.get('q'))
+            self.filter_params = form.cleaned_data
+        else:
+            self.filter_params = {}
+        self.filtered_queryset = queryset
+        queryset = queryset.select_related('owner').prefetch_related('images')
+        
+        if form.is_valid() and form.location:
+            # Nearest first; a bounded list, so it pages in memory
+            return geo.nearest(
+                queryset, *form.location, limit=self.max_nearby, radius_km=form.cleaned_data.get('radius')
+            )
+        return queryset
+    
+    def get_cursor_ordering(self):
+        # Most relevant first when there is a search term
+        if getattr(self, 'searching', False):
+            return ('-search_rank', '-id')
+        return super().get_cursor_ordering()
+    
+    def paginate_queryset(self, queryset, page_size):
+        """Serve the page from the result cache: ordered car ids plus the total.
+        
+        Distance searches are plain lists and are not cached.
+        """
+        if not isinstance(queryset, QuerySet):
+            return super().paginate_queryset(queryset, page_size)
+        
+        self.computed_page = None
+        position = [self.request.GET.get(self.cursor_param, ''), self.request.GET.get(self.page_kwarg, '')]
+        snapshot = get_or_compute(
+            browse_cache_key('results', self.filter_params, page_size, *position),
+            lambda: self.snapshot_page(queryset, page_size),
+            getattr(settings, 'BROWSE_RESULTS_CACHE_TIMEOUT', 60)
+        )
+        if self.computed_page is not None:
+            return self.computed_page
+        return self.restore_page(snapshot, queryset, page_size)
+    
+    def snapshot_page(self, queryset, page_size):
+        self.computed_page = paginator, page, object_list, is_paginated = super().paginate_queryset(queryset, page_size)
+        snapshot = {'ids': [car.pk for car in object_list]}
+        if isinstance(page, CursorPage):
+            snapshot.update(
+                next_cursor=page.next_cursor,
+                previous_cursor=page.previous_cursor,
+                total=paginator.approximate_count,
+            )
+        else:
+            snapshot.update(number=page.number, total=paginator.count)
+        return snapshot
+    
+    def restore_page(self, snapshot, queryset, page_size):
+        cars = queryset.order_by().in_bulk(snapshot['ids'])
+        object_list = [cars[pk] for pk in snapshot['ids'] if pk in cars]
+        if 'number' in snapshot:
+            paginator = self.get_paginator(queryset, page_size, allow_empty_first_page=self.get_allow_empty())
+            paginator.count = snapshot['total']
+            page = paginator.page(snapshot['number'])
+            page.object_list = object_list
+            return (paginator, page, object_list, page.has_other_pages())
         
-        return queryset.select_related('owner').prefetch_related('images')
+        paginator = CursorPaginator(queryset, page_size, self.get_cursor_ordering())
+        paginator.approximate_count = snapshot['total']
+        page = CursorPage(object_list, paginator, snapshot['next_cursor'], snapshot['previous_cursor'])
+        page.build_links(self.request.GET, self.cursor_param, self.page_kwarg)
+        return (paginator, page, object_list, False)
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_form'] = CarSearchForm(self.request.GET)
         context['car_types'] = Car.CAR_TYPES
+        # Counts for the current filters, ignoring the distance search
+        context['facets'] = facet_counts(self.filtered_queryset, self.filter_params)
         return context
 
-class CarDetailView(DetailView):
+class CarDetailView(ConditionalGetMixin, DetailView):
     """View for car details"""
     model = Car
     template_name = 'rentals/car_detail.html'
     context_object_name = 'car'
+    # Reviews and rentals bump the car's tag; similar cars follow any car change
+    cache_tags = ('car:{pk}', 'browse')
     
     def get_queryset(self):
         return Car.objects.filter(is_available=True, is_active=True)
     
+    def get_last_modified(self):
+        return self.get_queryset().filter(pk=self.kwargs['pk']).values_list('updated_at', flat=True).first()
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['similar_cars'] = Car.objects.filter(
@@ -388,12 +489,7 @@ class CarAvailabilityCheckView(View):
             end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
             
             # Check availability
-            is_available = not Rental.objects.filter(
-                car=car,
-                status__in=['pending', 'confirmed', 'active'],
-                start_date__lt=end_date,
-                end_date__gt=start_date
-            ).exists()
+            is_available = reservation_index.is_available(car.id, start_date, end_date)
             
             # Calculate total amount
             total_days = (end_date - start_date).days
@@ -409,4 +505,41 @@ class CarAvailabilityCheckView(View):
             
         except Exception as e:
             logger.error(f"Error checking availability: {str(e)}")
-            return JsonResponse({'error': 'Invalid request'}, status=400)
\ No newline at end of file
+            return JsonResponse({'error': 'Invalid request'}, status=400)
+
+class CarNearbyView(View):
+    """API endpoint listing cars by distance from a point, nearest first"""
+    max_results = 100
+    
+    def get(self, request):
+        form = CarSearchForm(request.GET)
+        if not form.is_valid() or not form.location:
+            errors = form.errors.get_json_data() if form.errors else {'lat': [{'message': 'lat and lng are required'}]}
+            return JsonResponse({'error': 'Invalid request', 'details': errors}, status=400)
+        
+        try:
+            limit = min(max(int(request.GET.get('limit', 20)), 1), self.max_results)
+        except ValueError:
+            return JsonResponse({'error': 'limit must be an integer'}, status=400)
+        
+        cars = geo.nearest(
+            form.filter_queryset(Car.objects.filter(is_active=True)),
+            *form.location,
+            limit=limit,
+            radius_km=form.cleaned_data.get('radius')
+        )
+        return JsonResponse({
+            'count': len(cars),
+            'results': [
+                {
+                    'id': car.id,
+                    'name': f"{car.make} {car.model}",
+                    'city': car.city,
+                    'daily_rate': float(car.daily_rate),
+                    'latitude': float(car.latitude),
+                    'longitude': float(car.longitude),
+                    'distance_km': car.distance_km,
+                }
+                for car in cars
+            ],
+        })
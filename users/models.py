@@ -2,6 +2,7 @@ from django.contrib.auth.models import AbstractUser
 from django.db import models
 from django.core.validators import RegexValidator
 from django.utils import timezone
+from carrentalsystem.cache_tags import TaggedQuerySet
 
 class User(AbstractUser):
     ACCOUNT_TYPES = (
@@ -62,6 +63,8 @@ class CarOwner(models.Model):
     created_at = models.DateTimeField(default=timezone.now)  # Changed from auto_now_add=True
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = TaggedQuerySet.as_manager()
+    
     class Meta:
         verbose_name = 'Car Owner'
         verbose_name_plural = 'Car Owners'
@@ -0,0 +1,99 @@
+"""Which profile (Customer or CarOwner) the current user has, looked up once.
+
+``request.user.customer_profile`` and ``owner_profile`` query on every
+access and, when the profile is missing, raise instead of caching the
+miss, so an owner paid a failed customer lookup on every render. Here
+both profile ids are read in one query and remembered on the request and,
+for ``PROFILE_SESSION_CACHE_TIMEOUT`` seconds, in the session. A missing
+profile read from the session is looked up again before it is reported,
+since the profile may have been created since (in another session, or by
+an admin); views that create or delete a profile call ``forget_profile``.
+"""
+import time
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+from .models import CarOwner, Customer, User
+
+SESSION_KEY = '_profile_ids'
+KINDS = {'customer': Customer, 'owner': CarOwner}
+
+
+def profile_ids(request):
+    """{'customer': id or None, 'owner': id or None} of the logged-in user"""
+    if not request.user.is_authenticated:
+        return {kind: None for kind in KINDS}
+    cached = getattr(request, '_profile_ids', None)
+    if cached is not None:
+        return cached
+
+    session = getattr(request, 'session', None)
+    saved = session.get(SESSION_KEY) if session is not None else None
+    timeout = getattr(settings, 'PROFILE_SESSION_CACHE_TIMEOUT', 300)
+    if saved and saved['user'] == request.user.pk and time.time() - saved['at'] < timeout:
+        ids = saved['ids']
+    else:
+        # Both reverse one-to-ones in one query, through LEFT JOINs
+        customer_id, owner_id = User.objects.filter(pk=request.user.pk).values_list(
+            'customer_profile__id', 'owner_profile__id'
+        ).first() or (None, None)
+        ids = {'customer': customer_id, 'owner': owner_id}
+        request._profile_ids_queried = True
+        if session is not None:
+            session[SESSION_KEY] = {'user': request.user.pk, 'at': time.time(), 'ids': ids}
+    request._profile_ids = ids
+    return ids
+
+
+def _get(request, kind):
+    profiles = request.__dict__.setdefault('_profiles', {})
+    if kind not in profiles:
+        profile_id = profile_ids(request)[kind]
+        if profile_id is None and not getattr(request, '_profile_ids_queried', False):
+            # Never turn a remembered miss into a redirect to the profile page
+            forget_profile(request)
+            profile_id = profile_ids(request)[kind]
+        profile = None
+        if profile_id is not None:
+            profile = KINDS[kind].objects.filter(pk=profile_id).first()
+            if profile is None:
+                forget_profile(request)
+            else:
+                # Later request.user.<kind>_profile accesses reuse it
+                setattr(request.user, f'{kind}_profile', profile)
+        profiles[kind] = profile
+    return profiles[kind]
+
+
+def get_customer_profile(request):
+    return _get(request, 'customer')
+
+
+def get_owner_profile(request):
+    return _get(request, 'owner')
+
+
+def get_profile(request):
+    """The customer profile, else the owner profile, else None"""
+    ids = profile_ids(request)
+    if ids['customer'] is not None:
+        return get_customer_profile(request)
+    if ids['owner'] is not None:
+        return get_owner_profile(request)
+    return None
+
+
+def lazy_profile(request):
+    """``get_profile`` deferred until the value is used"""
+    return SimpleLazyObject(lambda: get_profile(request))
+
+
+def forget_profile(request):
+    """Drop the remembered ids after a profile was created or deleted"""
+    request.__dict__.pop('_profile_ids', None)
+    request.__dict__.pop('_profile_ids_queried', None)
+    request.__dict__.pop('_profiles', None)
+    session = getattr(request, 'session', None)
+    if session is not None:
+        session.pop(SESSION_KEY, None)
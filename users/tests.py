@@ -1,3 +1,17 @@
 from django.test import TestCase
+from django.urls import reverse
 
-# Create your tests here.
+from .models import CarOwner, User
+
+
+class ProfileSessionCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', 'owner@example.com', 'password', account_type='owner')
+        self.client.force_login(self.user)
+
+    def test_remembered_missing_profile_is_looked_up_again(self):
+        dashboard = reverse('rentals:owner_dashboard')
+        self.assertRedirects(self.client.get(dashboard), reverse('users:profile_update'), fetch_redirect_response=False)
+        # Created outside this session, e.g. by an admin
+        CarOwner.objects.create(user=self.user)
+        self.assertEqual(self.client.get(dashboard).status_code, 200)
@@ -5,10 +5,14 @@ from django.urls import reverse_lazy
 from django.contrib import messages
 from django.shortcuts import redirect
 from django.db import transaction
+from django.conf import settings
 from .forms import SignUpForm, CustomLoginForm, UserUpdateForm, CustomerProfileForm, CarOwnerProfileForm
 from .models import Customer, CarOwner
+from .profiles import forget_profile
 from django.views.generic import TemplateView
 from rentals.models import Car
+from carrentalsystem.cache_tags import tagged_key
+from carrentalsystem.caching import get_or_compute
 
 class HomeView(TemplateView):
     template_name = 'users/home.html'
@@ -16,16 +20,20 @@ class HomeView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # Get available cars (limit to 6 for the homepage)
-        available_cars = Car.objects.filter(
-            is_available=True, 
-            is_active=True
-        ).select_related('owner')[:6]
+        # Get available cars (limit to 6 for the homepage); ids and count come from the browse result cache
+        available = Car.objects.filter(is_available=True, is_active=True)
+        snapshot = get_or_compute(
+            tagged_key(['browse'], 'home'),
+            lambda: {'ids': list(available.values_list('pk', flat=True)[:6]), 'total': available.count()},
+            getattr(settings, 'BROWSE_RESULTS_CACHE_TIMEOUT', 60)
+        )
+        cars = Car.objects.select_related('owner').in_bulk(snapshot['ids'])
+        available_cars = [cars[pk] for pk in snapshot['ids'] if pk in cars]
         
         # Add cars and statistics to context
         context.update({
             'cars': available_cars,
-            'total_cars': Car.objects.filter(is_available=True, is_active=True).count(),
+            'total_cars': snapshot['total'],
             'total_rentals': 2500,  # You can replace this with actual count if you have rental data
         })
         
@@ -68,11 +76,13 @@ class ProfileUpdateView(LoginRequiredMixin, FormView):
         return CarOwnerProfileForm
     
     def get_form(self, form_class=None):
+        # Whether or not it is created here, the profile exists now: drop any remembered miss
+        forget_profile(self.request)
         if self.request.user.account_type == 'customer':
-            profile, created = Customer.objects.get_or_create(user=self.request.user)
+            profile, _ = Customer.objects.get_or_create(user=self.request.user)
             return CustomerProfileForm(instance=profile, **self.get_form_kwargs())
         else:
-            profile, created = CarOwner.objects.get_or_create(user=self.request.user)
+            profile, _ = CarOwner.objects.get_or_create(user=self.request.user)
             return CarOwnerProfileForm(instance=profile, **self.get_form_kwargs())
     
     def get_context_data(self, **kwargs):